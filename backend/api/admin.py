@@ -0,0 +1,75 @@
+import io
+import pstats
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.urls import path, reverse
+from django.utils.html import format_html
+
+from .models import RequestProfile
+
+PROFILE_FILES = {
+    'stats': 'stats_file',
+    'stacks': 'stacks_file',
+}
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'created', 'method', 'path',
+                    'status_code', 'duration_ms', 'query_count', 'user')
+    list_filter = ('method', 'status_code')
+    search_fields = ('path',)
+    list_select_related = ('user',)
+    readonly_fields = ('created', 'user', 'method', 'path', 'status_code',
+                       'duration_ms', 'query_count', 'downloads',
+                       'top_functions')
+    exclude = ('stats_file', 'stacks_file')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def get_urls(self):
+        return [
+            path('<int:pk>/download/<str:kind>/',
+                 self.admin_site.admin_view(self.download),
+                 name='api_requestprofile_download'),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        if kind not in PROFILE_FILES or not self.has_view_permission(request):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        name = getattr(profile, PROFILE_FILES[kind])
+        file_path = Path(settings.REQUEST_PROFILING_ROOT) / name
+        if not file_path.exists():
+            raise Http404
+        return FileResponse(open(file_path, 'rb'),
+                            as_attachment=True, filename=name)
+
+    def downloads(self, obj):
+        return format_html(
+            '<a href="{}">pstats</a> | <a href="{}">collapsed stacks</a>',
+            reverse('admin:api_requestprofile_download',
+                    args=(obj.pk, 'stats')),
+            reverse('admin:api_requestprofile_download',
+                    args=(obj.pk, 'stacks')))
+
+    downloads.short_description = 'Файлы'
+
+    def top_functions(self, obj):
+        file_path = Path(settings.REQUEST_PROFILING_ROOT) / obj.stats_file
+        if not file_path.exists():
+            return '-пусто-'
+        output = io.StringIO()
+        stats = pstats.Stats(str(file_path), stream=output)
+        stats.sort_stats('cumulative').print_stats(40)
+        return format_html('<pre>{}</pre>', output.getvalue())
+
+    top_functions.short_description = 'Самые затратные функции'
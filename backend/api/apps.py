@@ -1,6 +1,32 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_init, post_save
 
 
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from rest_framework.authtoken.models import Token
+
+        from recipes.nutrition import nutrition_updated
+        from recipes.registry import reference_changed
+        from users.models import User
+        from . import changes
+        from .authentication import (invalidate_token, invalidate_user_tokens,
+                                     remember_auth_state)
+        from .events import publish_changes
+        from .models import ImageUpload, RequestProfile
+        from .profiling import delete_profile_files
+        from .snapshots import rebuild_snapshots
+        from .uploads import delete_upload_file
+
+        post_delete.connect(delete_profile_files, sender=RequestProfile)
+        post_delete.connect(delete_upload_file, sender=ImageUpload)
+        post_delete.connect(invalidate_token, sender=Token)
+        post_init.connect(remember_auth_state, sender=User)
+        post_save.connect(invalidate_user_tokens, sender=User)
+        reference_changed.connect(rebuild_snapshots)
+        changes.connect_signals()
+        nutrition_updated.connect(changes.record_nutrition)
+        changes.changes_committed.connect(publish_changes)
@@ -0,0 +1,151 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from recipes.registry import bump_version, get_version
+from users.models import User
+
+CACHE_PREFIX = 'auth-token:'
+# Номер версии в ReferenceVersion: растёт при удалении токена или
+# блокировке пользователя.
+VERSION_NAME = 'authtoken.token'
+
+
+class TokenCache:
+    """Кэш «токен -> снимок полей пользователя».
+
+    Первый уровень — ограниченный LRU внутри процесса, второй —
+    необязательный общий кэш Django. Записи живут не дольше TTL.
+    Отзыв токена или блокировка пользователя увеличивают номер версии
+    в БД; процесс сверяет его не чаще раза в
+    AUTH_TOKEN_CACHE_CHECK_INTERVAL секунд и при расхождении очищает
+    свой LRU, так что отзыв доходит до всех воркеров за этот интервал.
+    """
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.version = None
+        self.checked = 0
+
+    @property
+    def shared(self):
+        alias = settings.AUTH_TOKEN_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def check_version(self, now):
+        if now - self.checked < settings.AUTH_TOKEN_CACHE_CHECK_INTERVAL:
+            return
+        version = get_version(VERSION_NAME)
+        with self.lock:
+            if version != self.version:
+                self.entries.clear()
+                self.version = version
+            self.checked = now
+
+    def get(self, key):
+        now = time.monotonic()
+        self.check_version(now)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires, snapshot = entry
+                if expires > now:
+                    self.entries.move_to_end(key)
+                    return snapshot
+                del self.entries[key]
+        if self.shared is None:
+            return None
+        snapshot = self.shared.get(CACHE_PREFIX + key)
+        if snapshot is not None:
+            self.store(key, snapshot)
+        return snapshot
+
+    def set(self, key, snapshot):
+        self.store(key, snapshot)
+        if self.shared is not None:
+            self.shared.set(CACHE_PREFIX + key, snapshot,
+                            settings.AUTH_TOKEN_CACHE_TTL)
+
+    def store(self, key, snapshot):
+        with self.lock:
+            self.entries[key] = (
+                time.monotonic() + settings.AUTH_TOKEN_CACHE_TTL, snapshot)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.AUTH_TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+        if self.shared is not None and keys:
+            self.shared.delete_many([CACHE_PREFIX + key for key in keys])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def revoke(self, *keys):
+        """Удаляет токены здесь и, после коммита, во всех процессах."""
+        self.delete(*keys)
+        bump_version(VERSION_NAME)
+        # Запрос, успевший до коммита снова положить токен в кэш,
+        # не должен его там оставить.
+        transaction.on_commit(lambda: self.delete(*keys))
+
+
+token_cache = TokenCache()
+
+
+def make_snapshot(user):
+    fields = User._meta.concrete_fields
+    return (tuple(field.attname for field in fields),
+            tuple(getattr(user, field.attname) for field in fields))
+
+
+def restore_snapshot(snapshot):
+    field_names, values = snapshot
+    return User.from_db('default', field_names, values)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без обращения к БД на каждый запрос."""
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is None:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(key, make_snapshot(user))
+            return user, token
+        user = restore_snapshot(snapshot)
+        return user, Token(key=key, user=user)
+
+
+def auth_state(user):
+    # Поля, отложенные через only(), в __dict__ отсутствуют.
+    return tuple(user.__dict__.get(name) for name in ('is_active', 'password'))
+
+
+def remember_auth_state(sender, instance, **kwargs):
+    instance._auth_state = auth_state(instance)
+
+
+def invalidate_token(sender, instance, **kwargs):
+    token_cache.revoke(instance.key)
+
+
+def invalidate_user_tokens(sender, instance, created, **kwargs):
+    """Отзывает токены, только если сменились активность или пароль."""
+    state = auth_state(instance)
+    changed = not created and state != instance._auth_state
+    instance._auth_state = state
+    if changed:
+        token_cache.revoke(*Token.objects.filter(
+            user_id=instance.pk).values_list('key', flat=True))
@@ -0,0 +1,187 @@
+import threading
+from contextlib import contextmanager
+
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal
+
+from recipes.models import (Favorites, Recipe, RecipeIngredient,
+                            ReferenceVersion, ShoppingCart, Tag)
+from users.models import Subscription
+from .models import Change
+
+HORIZON = 'api.change'
+
+# Модель, тема, поле с ID объекта, поле с владельцем, пишется ли удаление.
+SOURCES = (
+    (Recipe, Change.RECIPE, 'id', None, True),
+    # Удаление строк ингредиентов всегда сопровождается сохранением
+    # или удалением самого рецепта, его и достаточно.
+    (RecipeIngredient, Change.RECIPE, 'recipe_id', None, False),
+    (Tag, Change.TAG, 'id', None, True),
+    (Favorites, Change.FAVORITE, 'recipe_id', 'user_id', True),
+    (ShoppingCart, Change.SHOPPING_CART, 'recipe_id', 'user_id', True),
+    (Subscription, Change.SUBSCRIPTION, 'author_id', 'user_id', True),
+)
+TOPICS = {model: topic for model, topic, *_ in SOURCES}
+
+# Отправляется после коммита со списком записанных изменений.
+changes_committed = Signal()
+
+_state = threading.local()
+
+
+@contextmanager
+def suppressed():
+    """Отключает запись из сигналов для пакетных операций.
+
+    Код внутри блока сам записывает изменения через record().
+    """
+    previous = getattr(_state, 'suppressed', False)
+    _state.suppressed = True
+    try:
+        yield
+    finally:
+        _state.suppressed = previous
+
+
+def announce(changes):
+    if changes and changes_committed.has_listeners(Change):
+        transaction.on_commit(
+            partial(changes_committed.send, sender=Change, changes=changes))
+
+
+def record(topic, object_ids, action, user_pk=None):
+    announce(Change.objects.bulk_create(
+        Change(topic=topic, object_id=object_id, action=action,
+               user_pk=user_pk)
+        for object_id in object_ids))
+
+
+def record_nutrition(sender, recipe_ids, **kwargs):
+    # Массовый пересчёт КБЖУ сохраняет рецепты через bulk_update.
+    record(Change.RECIPE, recipe_ids, Change.UPSERT)
+
+
+def make_receiver(topic, object_field, user_field, action):
+    def receiver(sender, instance, **kwargs):
+        if getattr(_state, 'suppressed', False):
+            return
+        announce([Change.objects.create(
+            topic=topic,
+            object_id=getattr(instance, object_field),
+            action=action,
+            user_pk=user_field and getattr(instance, user_field))])
+    return receiver
+
+
+def connect_signals():
+    for model, topic, object_field, user_field, deletes in SOURCES:
+        post_save.connect(
+            make_receiver(topic, object_field, user_field, Change.UPSERT),
+            sender=model, weak=False)
+        if deletes:
+            post_delete.connect(
+                make_receiver(topic, object_field, user_field,
+                              Change.DELETE),
+                sender=model, weak=False)
+
+
+def as_event(position, topic, object_id, action):
+    """Изменение в том виде, в каком его получает клиент."""
+    return {'cursor': position, 'topic': topic, 'id': object_id,
+            'action': action}
+
+
+def get_horizon():
+    """Последний курсор, записи до которого уже удалены из ленты."""
+    return ReferenceVersion.objects.filter(name=HORIZON).values_list(
+        'version', flat=True).first() or 0
+
+
+def latest_cursor():
+    return Change.objects.filter(position__isnull=False).order_by(
+        '-position').values_list('position', flat=True).first() or (
+        get_horizon())
+
+
+def read_changes(changes, since, limit):
+    """Изменения после курсора since и курсор для следующего чтения.
+
+    Позиции присваиваются при коммите в порядке коммитов, поэтому
+    запись, которая станет видна позже, получит позицию больше любой
+    уже видимой, и курсор сдвигается за все прочитанные записи.
+    """
+    rows = list(changes.filter(position__gt=since).order_by(
+        'position').values(
+        'position', 'topic', 'object_id', 'action')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    cursor = rows[-1]['position'] if rows else since
+    return rows, cursor, has_more
+
+
+class ChangeTail:
+    """Чтение ленты изменений процессом, например для сброса кэшей.
+
+    Одно и то же изменение может прийти повторно, поэтому обработчики
+    должны быть идемпотентными.
+    """
+
+    def __init__(self, topics=None, cursor=None):
+        self.topics = topics
+        self.cursor = latest_cursor() if cursor is None else cursor
+
+    def poll(self, limit=1000):
+        changes = Change.objects.filter(user_pk__isnull=True)
+        if self.topics:
+            changes = changes.filter(topic__in=self.topics)
+        rows, self.cursor, _ = read_changes(changes, self.cursor, limit)
+        return rows
+
+
+def delete_in_batches(changes, batch_size):
+    deleted = last_position = 0
+    while True:
+        rows = list(changes.order_by('position').values_list(
+            'id', 'position')[:batch_size])
+        if not rows:
+            return deleted, last_position
+        Change.objects.filter(id__in=[pk for pk, _ in rows]).delete()
+        deleted += len(rows)
+        last_position = rows[-1][1]
+
+
+def fold_changes(batch_size):
+    """Удаляет записи, перекрытые более новыми о том же объекте.
+
+    Читатель с любым курсором всё равно получит последнюю запись,
+    а по ней — итоговое состояние объекта.
+    """
+    newer = Change.objects.filter(
+        topic=OuterRef('topic'), object_id=OuterRef('object_id'),
+        position__gt=OuterRef('position'))
+    public = Change.objects.filter(user_pk__isnull=True).filter(
+        Exists(newer.filter(user_pk__isnull=True)))
+    private = Change.objects.filter(user_pk__isnull=False).filter(
+        Exists(newer.filter(user_pk=OuterRef('user_pk'))))
+    return (delete_in_batches(public, batch_size)[0]
+            + delete_in_batches(private, batch_size)[0])
+
+
+def expire_changes(older_than, batch_size):
+    """Удаляет старые записи и сдвигает горизонт ленты."""
+    deleted, last_position = delete_in_batches(
+        Change.objects.filter(created__lt=older_than,
+                              position__isnull=False), batch_size)
+    if last_position:
+        updated = ReferenceVersion.objects.filter(
+            name=HORIZON, version__lt=last_position).update(
+            version=last_position)
+        if not updated:
+            ReferenceVersion.objects.get_or_create(
+                name=HORIZON, defaults={'version': last_position})
+    return deleted
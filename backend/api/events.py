@@ -0,0 +1,443 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from collections import defaultdict
+from functools import lru_cache
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import signing
+from django.db import close_old_connections, connection
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from users.models import User
+from .authentication import CachedTokenAuthentication, token_cache
+from .changes import as_event, get_horizon, read_changes
+from .models import Change
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'foodgram_events'
+# Изменения, которые рассылаются владельцу списка в реальном времени.
+LIVE_TOPICS = (Change.FAVORITE, Change.SHOPPING_CART)
+# Длина уведомления PostgreSQL ограничена 8000 байт.
+EVENTS_PER_MESSAGE = 50
+RECONNECT_DELAY = 1
+# Клиенту нужно заново загрузить списки: часть событий потеряна.
+RESYNC = {'event': 'resync'}
+TICKET_SALT = 'api.events.ticket'
+
+
+def offer(queue, event):
+    try:
+        queue.put_nowait(event)
+    except asyncio.QueueFull:
+        # Клиент не успевает читать: вместо очереди событий
+        # он получит одно указание пересинхронизироваться.
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(RESYNC)
+
+
+class Broker:
+    """Раздаёт сообщения открытым потокам событий своего процесса."""
+
+    def __init__(self):
+        self.streams = defaultdict(set)
+
+    def subscribe(self, user_pk):
+        queue = asyncio.Queue(settings.EVENTS_QUEUE_SIZE)
+        self.streams[user_pk].add(queue)
+        return queue
+
+    def unsubscribe(self, user_pk, queue):
+        streams = self.streams.get(user_pk, set())
+        streams.discard(queue)
+        if not streams:
+            self.streams.pop(user_pk, None)
+
+    def dispatch(self, message):
+        for queue in self.streams.get(message['user'], ()):
+            for event in message['events']:
+                offer(queue, event)
+
+    def resync(self):
+        for streams in self.streams.values():
+            for queue in streams:
+                offer(queue, RESYNC)
+
+
+class LocalBackend:
+    """Доставка внутри одного процесса.
+
+    Подходит для разработки, когда и API, и поток событий обслуживает
+    один ASGI-сервер с одним воркером.
+    """
+
+    def __init__(self):
+        self.loop = self.broker = None
+
+    def publish(self, message):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.broker.dispatch, message)
+
+    async def listen(self, broker):
+        self.loop, self.broker = asyncio.get_running_loop(), broker
+
+    async def close(self):
+        self.loop = self.broker = None
+
+
+class PostgresBackend:
+    """Доставка между процессами через LISTEN/NOTIFY PostgreSQL.
+
+    Каждый ASGI-воркер держит одно слушающее соединение независимо от
+    числа открытых потоков событий.
+    """
+
+    def __init__(self):
+        self.task = None
+
+    def publish(self, message):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)',
+                           [CHANNEL, json.dumps(message)])
+
+    async def listen(self, broker):
+        self.task = asyncio.ensure_future(self.run(broker))
+
+    async def close(self):
+        if self.task is not None:
+            self.task.cancel()
+
+    def connect(self):
+        import psycopg2
+
+        listener = psycopg2.connect(**connection.get_connection_params())
+        listener.set_session(autocommit=True)
+        with listener.cursor() as cursor:
+            cursor.execute(f'LISTEN {CHANNEL}')
+        return listener
+
+    async def run(self, broker):
+        import psycopg2
+
+        loop = asyncio.get_running_loop()
+        connected_before = False
+        while True:
+            try:
+                listener = await loop.run_in_executor(None, self.connect)
+            except psycopg2.Error:
+                logger.exception('Не удалось подписаться на %s', CHANNEL)
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            if connected_before:
+                # Пока соединения не было, уведомления терялись.
+                broker.resync()
+            connected_before = True
+            readable = asyncio.Event()
+            loop.add_reader(listener, readable.set)
+            try:
+                while True:
+                    await readable.wait()
+                    readable.clear()
+                    listener.poll()
+                    while listener.notifies:
+                        broker.dispatch(
+                            json.loads(listener.notifies.pop(0).payload))
+            except psycopg2.Error:
+                logger.exception('Соединение с %s потеряно', CHANNEL)
+            finally:
+                loop.remove_reader(listener)
+                listener.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    if settings.EVENTS_BACKEND:
+        return import_string(settings.EVENTS_BACKEND)()
+    if connection.vendor == 'postgresql':
+        return PostgresBackend()
+    return LocalBackend()
+
+
+def publish_changes(sender, changes, **kwargs):
+    """Рассылает изменения списков их владельцам после коммита."""
+    changes = [change for change in changes
+               if change.user_pk and change.topic in LIVE_TOPICS]
+    if not changes:
+        return
+    # Позиции присваиваются при коммите, у объектов их ещё нет.
+    positions = dict(Change.objects.filter(
+        id__in=[change.id for change in changes]).values_list(
+        'id', 'position'))
+    by_user = defaultdict(list)
+    for change in changes:
+        by_user[change.user_pk].append(as_event(
+            positions.get(change.id), change.topic, change.object_id,
+            change.action))
+    backend = get_backend()
+    for user_pk, events in by_user.items():
+        for start in range(0, len(events), EVENTS_PER_MESSAGE):
+            backend.publish({
+                'user': user_pk,
+                'events': events[start:start + EVENTS_PER_MESSAGE]})
+
+
+def database_sync_to_async(func):
+    def wrapper(*args):
+        close_old_connections()
+        try:
+            return func(*args)
+        finally:
+            close_old_connections()
+    return sync_to_async(wrapper, thread_sensitive=True)
+
+
+def token_digest(key):
+    return key and hashlib.sha256(key.encode()).hexdigest()
+
+
+def make_ticket(user, token=None):
+    """Подписанный билет на открытие потока событий.
+
+    EventSource в браузере не умеет передавать заголовки, а токен в
+    адресе попал бы в журналы прокси. Билет живёт EVENTS_TICKET_MAX_AGE
+    секунд и вместо самого токена содержит его хеш.
+    """
+    return signing.dumps(
+        [user.pk, token_digest(getattr(token, 'key', None))],
+        salt=TICKET_SALT, compress=True)
+
+
+def read_ticket(ticket):
+    try:
+        user_pk, digest = signing.loads(
+            ticket, salt=TICKET_SALT, max_age=settings.EVENTS_TICKET_MAX_AGE)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    return user_pk, digest
+
+
+def is_authorized(user_pk, digest):
+    """Активен ли пользователь и действует ли токен, выдавший доступ."""
+    if digest is None:
+        return User.objects.filter(pk=user_pk, is_active=True).exists()
+    key = Token.objects.filter(
+        user_id=user_pk, user__is_active=True).values_list(
+        'key', flat=True).first()
+    return key is not None and constant_time_compare(
+        token_digest(key), digest)
+
+
+@database_sync_to_async
+def authenticate(key):
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return None
+    return user.pk, token_digest(key)
+
+
+@database_sync_to_async
+def authenticate_ticket(ticket):
+    credentials = read_ticket(ticket)
+    if credentials is None or not is_authorized(*credentials):
+        return None
+    return credentials
+
+
+@database_sync_to_async
+def reauthorize(user_pk, digest):
+    return is_authorized(user_pk, digest)
+
+
+@database_sync_to_async
+def check_token_version(now):
+    token_cache.check_version(now)
+
+
+async def token_version():
+    """Номер версии токенов; БД опрашивается не чаще, чем кэш токенов."""
+    now = time.monotonic()
+    if (token_cache.version is None or now - token_cache.checked
+            >= settings.AUTH_TOKEN_CACHE_CHECK_INTERVAL):
+        await check_token_version(now)
+    return token_cache.version
+
+
+@database_sync_to_async
+def missed_events(user_pk, since):
+    """События после since для переподключившегося клиента."""
+    if since < get_horizon():
+        return [RESYNC]
+    rows, _, has_more = read_changes(
+        Change.objects.filter(user_pk=user_pk, topic__in=LIVE_TOPICS),
+        since, settings.CHANGES_PAGE_SIZE)
+    if has_more:
+        return [RESYNC]
+    return [as_event(row['position'], row['topic'], row['object_id'],
+                     row['action'])
+            for row in rows]
+
+
+def format_event(event):
+    if event is RESYNC:
+        return b'event: resync\ndata: {}\n\n'
+    lines = f'data: {json.dumps(event, separators=(",", ":"))}\n\n'
+    if event['cursor'] is not None:
+        lines = f'id: {event["cursor"]}\n' + lines
+    return lines.encode()
+
+
+def get_token(scope):
+    headers = dict(scope['headers'])
+    scheme, _, key = headers.get(b'authorization', b'').decode(
+        'latin-1').partition(' ')
+    if scheme.lower() == 'token' and key:
+        return key.strip()
+    return None
+
+
+def get_ticket(scope):
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    return query.get('ticket', [None])[0]
+
+
+async def get_credentials(scope):
+    key = get_token(scope)
+    if key:
+        return await authenticate(key)
+    ticket = get_ticket(scope)
+    if ticket:
+        return await authenticate_ticket(ticket)
+    return None
+
+
+def get_last_event_id(scope):
+    value = dict(scope['headers']).get(b'last-event-id', b'')
+    return int(value) if value.isdigit() else None
+
+
+async def wait_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def respond(send, status, data):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', b'application/json')]})
+    await send({'type': 'http.response.body',
+                'body': json.dumps(data, ensure_ascii=False).encode()})
+
+
+class EventStream:
+    """ASGI-приложение: поток Server-Sent Events по адресу EVENTS_PATH.
+
+    Остальные запросы передаются приложению Django. Открытый поток —
+    это одна ожидающая корутина и небольшая очередь, поэтому воркер
+    держит тысячи простаивающих соединений. Раз в EVENTS_KEEPALIVE
+    секунд поток сверяет версию токенов и после отзыва токена или
+    блокировки пользователя закрывается.
+    """
+
+    def __init__(self, application):
+        self.application = application
+        self.broker = Broker()
+        self.listening = False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['path'] == settings.EVENTS_PATH:
+            return await self.stream(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+    async def start(self):
+        if not self.listening:
+            self.listening = True
+            await get_backend().listen(self.broker)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await get_backend().close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def stream(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            return await respond(send, 405, {'detail': 'Метод не разрешен.'})
+        version = await token_version()
+        credentials = await get_credentials(scope)
+        if not credentials:
+            return await respond(
+                send, 401, {'detail': 'Учетные данные не были предоставлены.'})
+        user_pk, _ = credentials
+        await self.start()
+        queue = self.broker.subscribe(user_pk)
+        try:
+            await send({'type': 'http.response.start', 'status': 200,
+                        'headers': [
+                            (b'content-type',
+                             b'text/event-stream; charset=utf-8'),
+                            (b'cache-control', b'no-cache'),
+                            (b'x-accel-buffering', b'no')]})
+            retry = settings.EVENTS_RETRY * 1000
+            await send({'type': 'http.response.body',
+                        'body': f'retry: {retry}\n\n'.encode(),
+                        'more_body': True})
+            since = get_last_event_id(scope)
+            if since is not None:
+                for event in await missed_events(user_pk, since):
+                    offer(queue, event)
+            await self.forward(queue, receive, send, credentials, version)
+        finally:
+            self.broker.unsubscribe(user_pk, queue)
+
+    async def forward(self, queue, receive, send, credentials, version):
+        disconnected = asyncio.ensure_future(wait_disconnect(receive))
+        getter = None
+        loop = asyncio.get_running_loop()
+        checked = loop.time()
+        try:
+            while True:
+                if loop.time() - checked >= settings.EVENTS_KEEPALIVE:
+                    checked = loop.time()
+                    current = await token_version()
+                    if current != version:
+                        if not await reauthorize(*credentials):
+                            await send({'type': 'http.response.body',
+                                        'body': b'', 'more_body': False})
+                            return
+                        version = current
+                getter = getter or asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait(
+                    (getter, disconnected),
+                    timeout=settings.EVENTS_KEEPALIVE,
+                    return_when=asyncio.FIRST_COMPLETED)
+                if disconnected in done:
+                    return
+                if getter in done:
+                    body = format_event(getter.result())
+                    getter = None
+                else:
+                    # Комментарий не даёт прокси закрыть тихое соединение.
+                    body = b': ping\n\n'
+                await send({'type': 'http.response.body', 'body': body,
+                            'more_body': True})
+        finally:
+            disconnected.cancel()
+            if getter is not None:
+                getter.cancel()
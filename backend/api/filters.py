@@ -1,6 +1,22 @@
+from django.db.models import Count, Exists, OuterRef, Q
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes import registry
+from recipes.models import Ingredient, MealPlan, Recipe
+from users.models import User
+
+RecipeTag = Recipe.tags.through
+
+TAGS_MATCH_ANY = 'any'
+TAGS_MATCH_ALL = 'all'
+# Поля поиска пользователей; для каждого в users/migrations есть
+# индекс по UPPER(поле) для поиска по началу строки.
+USER_SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+USER_SEARCH_MAX_WORDS = 3
+
+
+def tag_choices():
+    return [(tag.slug, tag.name) for tag in registry.tags.all()]
 
 
 class IngredientFilter(FilterSet):
@@ -13,22 +29,87 @@ class IngredientFilter(FilterSet):
         fields = ('name',)
 
 
+class MealPlanFilter(FilterSet):
+    """План питания за период и по приёму пищи."""
+
+    start = filters.DateFilter(field_name='date', lookup_expr='gte')
+    end = filters.DateFilter(field_name='date', lookup_expr='lte')
+    meal = filters.ChoiceFilter(choices=MealPlan.MEALS)
+
+    class Meta:
+        model = MealPlan
+        fields = ('start', 'end', 'meal')
+
+
+class UserFilter(FilterSet):
+    """Поиск пользователей по началу имени, фамилии или логина.
+
+    Каждое слово запроса должно совпасть с началом одного из полей:
+    «иван пет» найдёт Ивана Петрова.
+    """
+
+    search = filters.CharFilter(method='search_filter')
+
+    class Meta:
+        model = User
+        fields = ('search',)
+
+    def search_filter(self, queryset, name, value):
+        for word in value.split()[:USER_SEARCH_MAX_WORDS]:
+            matches = Q()
+            for field in USER_SEARCH_FIELDS:
+                matches |= Q(**{f'{field}__istartswith': word})
+            queryset = queryset.filter(matches)
+        return queryset
+
+
 class RecipeFilter(FilterSet):
     """Фильтрация рецептов."""
 
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug')
+    tags = filters.MultipleChoiceFilter(
+        choices=tag_choices,
+        method='tags_filter')
+    tags_match = filters.ChoiceFilter(
+        choices=((TAGS_MATCH_ANY, 'Любой из тегов'),
+                 (TAGS_MATCH_ALL, 'Все теги')),
+        method='tags_match_filter')
     is_favorited = filters.BooleanFilter(
         method='is_favorited_filter')
     is_in_shopping_cart = filters.BooleanFilter(
         method='is_in_shopping_cart_filter')
+    # Итоги КБЖУ хранятся в рецепте, у каждого столбца свой индекс.
+    min_calories = filters.NumberFilter(
+        field_name='calories', lookup_expr='gte')
+    max_calories = filters.NumberFilter(
+        field_name='calories', lookup_expr='lte')
+    min_proteins = filters.NumberFilter(
+        field_name='proteins', lookup_expr='gte')
+    max_fats = filters.NumberFilter(
+        field_name='fats', lookup_expr='lte')
+    max_carbohydrates = filters.NumberFilter(
+        field_name='carbohydrates', lookup_expr='lte')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author')
 
+    def tags_filter(self, queryset, name, value):
+        tag_ids = {registry.tags.get_by('slug', slug).pk for slug in value}
+        if self.form.cleaned_data.get('tags_match') == TAGS_MATCH_ALL:
+            recipes = (
+                RecipeTag.objects
+                .filter(tag_id__in=tag_ids)
+                .values('recipe_id')
+                .annotate(matched=Count('tag_id'))
+                .filter(matched=len(tag_ids))
+                .values('recipe_id'))
+            return queryset.filter(pk__in=recipes)
+        return queryset.filter(Exists(RecipeTag.objects.filter(
+            recipe_id=OuterRef('pk'), tag_id__in=tag_ids)))
+
+    def tags_match_filter(self, queryset, name, value):
+        return queryset
+
     def is_favorited_filter(self, queryset, name, value):
         user = self.request.user
         if value and user.is_authenticated:
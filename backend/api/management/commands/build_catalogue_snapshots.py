@@ -0,0 +1,15 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.snapshots import build_snapshots
+
+
+class Command(BaseCommand):
+    help = "Write static JSON snapshots of tags and ingredients"
+
+    def handle(self, *args, **options):
+        if not settings.CATALOGUE_SNAPSHOT_ROOT:
+            raise CommandError('Не задан CATALOGUE_SNAPSHOT_ROOT')
+        for name, url in build_snapshots().items():
+            self.stdout.write(f'{name}: {url}')
+        self.stdout.write(self.style.SUCCESS('Снимки справочников обновлены'))
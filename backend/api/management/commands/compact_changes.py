@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.changes import expire_changes, fold_changes
+
+
+class Command(BaseCommand):
+    help = "Fold superseded change-feed entries and drop expired ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int,
+                            default=settings.CHANGES_RETENTION_DAYS,
+                            help='Drop entries older than this many days')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        folded = fold_changes(options['batch_size'])
+        expired = expire_changes(
+            timezone.now() - timedelta(days=options['keep_days']),
+            options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Свёрнуто записей: {folded}, удалено устаревших: {expired}'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.profiling import make_profile_token
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = "Issue a signed token that enables request profiling"
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help='Email сотрудника')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(
+            email=options['email'], is_staff=True).first()
+        if user is None:
+            raise CommandError('Сотрудник с таким email не найден')
+        self.stdout.write(make_profile_token(user))
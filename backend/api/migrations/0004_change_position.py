@@ -0,0 +1,101 @@
+from django.db import migrations, models
+
+# Позиция записи ленты присваивается в порядке коммитов, поэтому курсор
+# можно сдвигать за любую видимую запись: транзакция, которая
+# зафиксируется позже, получит большую позицию.
+#
+# На PostgreSQL отложенный триггер срабатывает при коммите и берёт
+# позицию из последовательности под транзакционной advisory-блокировкой.
+# Блокировка снимается после того, как коммит стал виден, поэтому
+# следующая транзакция получает позицию только после фиксации
+# предыдущей. Номера id так использовать нельзя: они выдаются при
+# вставке, и долгая транзакция может зафиксировать номер меньше уже
+# прочитанного.
+#
+# SQLite выполняет пишущие транзакции по одной, там порядок id и есть
+# порядок коммитов, и позиция просто повторяет id. Django пересоздаёт
+# таблицу SQLite при изменении её полей, триггер тогда нужно создать
+# заново.
+LOCK_KEY = 8321470523
+SEQUENCE = 'api_change_position_seq'
+
+POSTGRESQL_CREATE = (
+    f'CREATE SEQUENCE {SEQUENCE}',
+    f"SELECT setval('{SEQUENCE}', "
+    f'(SELECT COALESCE(MAX(id), 0) + 1 FROM api_change), false)',
+    f'''
+    CREATE FUNCTION api_change_assign_position() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_advisory_xact_lock({LOCK_KEY});
+        UPDATE api_change SET position = nextval('{SEQUENCE}')
+        WHERE id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    ''',
+    '''
+    CREATE CONSTRAINT TRIGGER api_change_position
+    AFTER INSERT ON api_change
+    DEFERRABLE INITIALLY DEFERRED
+    FOR EACH ROW EXECUTE FUNCTION api_change_assign_position()
+    ''',
+)
+POSTGRESQL_DROP = (
+    'DROP TRIGGER IF EXISTS api_change_position ON api_change',
+    'DROP FUNCTION IF EXISTS api_change_assign_position()',
+    f'DROP SEQUENCE IF EXISTS {SEQUENCE}',
+)
+SQLITE_CREATE = (
+    '''
+    CREATE TRIGGER api_change_position AFTER INSERT ON api_change
+    BEGIN
+        UPDATE api_change SET position = NEW.id WHERE id = NEW.id;
+    END
+    ''',
+)
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS api_change_position',
+)
+
+
+def create_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    # Уже прочитанные клиентами курсоры остаются действительными.
+    schema_editor.execute('UPDATE api_change SET position = id')
+    if vendor == 'postgresql':
+        statements = POSTGRESQL_CREATE
+    elif vendor == 'sqlite':
+        statements = SQLITE_CREATE
+    else:
+        raise NotImplementedError(
+            f'Лента изменений не поддерживает {vendor}')
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_trigger(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRESQL_DROP,
+                  'sqlite': SQLITE_DROP}.get(vendor, ())
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_change'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='change',
+            name='position',
+            field=models.BigIntegerField(editable=False, null=True, unique=True, verbose_name='Позиция в ленте'),
+        ),
+        migrations.AlterModelOptions(
+            name='change',
+            options={'ordering': ('position',), 'verbose_name': 'Изменение', 'verbose_name_plural': 'Изменения'},
+        ),
+        migrations.RunPython(create_trigger, drop_trigger),
+    ]
@@ -0,0 +1,153 @@
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class RequestProfile(models.Model):
+    """Профиль выполнения отдельного запроса к API."""
+
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Инициатор',
+        related_name='request_profiles')
+    method = models.CharField(
+        'Метод',
+        max_length=10)
+    path = models.CharField(
+        'Адрес',
+        max_length=2048)
+    status_code = models.PositiveSmallIntegerField(
+        'Код ответа')
+    duration_ms = models.FloatField(
+        'Длительность (мс)')
+    query_count = models.PositiveIntegerField(
+        'Запросов к БД',
+        default=0)
+    stats_file = models.CharField(
+        'Файл pstats',
+        max_length=255)
+    stacks_file = models.CharField(
+        'Файл со свёрнутыми стеками',
+        max_length=255)
+
+    class Meta:
+        verbose_name = 'Профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.method} {self.path[:50]} ({self.duration_ms:.0f} мс)'
+
+
+class ImageUpload(models.Model):
+    """Изображение, загружаемое частями до создания рецепта."""
+
+    token = models.UUIDField(
+        'Токен',
+        default=uuid.uuid4,
+        unique=True,
+        editable=False)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='image_uploads')
+    size = models.PositiveIntegerField(
+        'Размер файла')
+    offset = models.PositiveIntegerField(
+        'Получено байт',
+        default=0)
+    filename = models.CharField(
+        'Имя файла',
+        max_length=255,
+        blank=True)
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+        db_index=True)
+
+    class Meta:
+        verbose_name = 'Загрузка изображения'
+        verbose_name_plural = 'Загрузки изображений'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.token} ({self.offset}/{self.size})'
+
+    @property
+    def is_complete(self):
+        return bool(self.filename)
+
+
+class Change(models.Model):
+    """Запись ленты изменений (transactional outbox).
+
+    Пишется в той же транзакции, что и само изменение. Курсором для
+    клиентов и процессов, читающих ленту, служит позиция: её присваивает
+    триггер базы данных в порядке коммитов (см. миграцию 0004_change_position).
+    """
+
+    RECIPE = 'recipe'
+    TAG = 'tag'
+    FAVORITE = 'favorite'
+    SHOPPING_CART = 'shopping_cart'
+    SUBSCRIPTION = 'subscription'
+    TOPICS = (
+        (RECIPE, 'Рецепт'),
+        (TAG, 'Тег'),
+        (FAVORITE, 'Избранное'),
+        (SHOPPING_CART, 'Список покупок'),
+        (SUBSCRIPTION, 'Подписка'),
+    )
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTIONS = (
+        (UPSERT, 'Создание или изменение'),
+        (DELETE, 'Удаление'),
+    )
+
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True,
+        db_index=True)
+    topic = models.CharField(
+        'Тип объекта',
+        max_length=20,
+        choices=TOPICS)
+    object_id = models.BigIntegerField(
+        'ID объекта')
+    action = models.CharField(
+        'Действие',
+        max_length=10,
+        choices=ACTIONS)
+    # Не внешний ключ: записи о личных списках удалённого пользователя
+    # не должны мешать удалению и уходят при очистке ленты.
+    user_pk = models.BigIntegerField(
+        'ID владельца',
+        null=True,
+        blank=True,
+        db_index=True)
+    position = models.BigIntegerField(
+        'Позиция в ленте',
+        null=True,
+        unique=True,
+        editable=False)
+
+    class Meta:
+        verbose_name = 'Изменение'
+        verbose_name_plural = 'Изменения'
+        ordering = ('position',)
+        indexes = (
+            models.Index(fields=('topic', 'object_id'),
+                         name='change_topic_object_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.id}: {self.topic} {self.object_id} {self.action}'
@@ -0,0 +1,169 @@
+import cProfile
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+from .models import RequestProfile
+
+TOKEN_SALT = 'api.profiling'
+# Только заголовок: параметр запроса попал бы в журналы доступа.
+TOKEN_HEADER = 'HTTP_X_PROFILE_TOKEN'
+
+
+def make_profile_token(user):
+    """Подписанный токен, включающий профилирование запросов."""
+    return signing.dumps({'uid': user.pk}, salt=TOKEN_SALT)
+
+
+def get_request_user(request):
+    """Пользователь запроса: из сессии или по токену API."""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user
+    try:
+        result = CachedTokenAuthentication().authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def get_profile_user(token, user):
+    """Пользователь, если он сотрудник и токен выдан ему, иначе None."""
+    if user is None or not (user.is_staff and user.is_active):
+        return None
+    try:
+        data = signing.loads(
+            token, salt=TOKEN_SALT,
+            max_age=settings.REQUEST_PROFILING_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return user if data.get('uid') == user.pk else None
+
+
+def get_profiles_root():
+    root = Path(settings.REQUEST_PROFILING_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+class StackSampler:
+    """Периодически снимает стек потока и копит свёрнутые стеки."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} '
+                    f'({os.path.basename(code.co_filename)}:'
+                    f'{frame.f_lineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w', encoding='utf-8') as file:
+            for stack, count in self.stacks.items():
+                file.write(f'{stack} {count}\n')
+
+
+def trim_profiles():
+    """Оставляет на диске только последние профили."""
+    stale = RequestProfile.objects.order_by('-created', '-id')[
+        settings.REQUEST_PROFILING_MAX_ENTRIES:]
+    for profile in stale:
+        profile.delete()
+
+
+def delete_profile_files(sender, instance, **kwargs):
+    root = Path(settings.REQUEST_PROFILING_ROOT)
+    for name in (instance.stats_file, instance.stacks_file):
+        if name:
+            (root / name).unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """Профилирование запроса по подписанному заголовку X-Profile-Token.
+
+    Токен действует только вместе с входом того сотрудника, которому он
+    выдан: по сессии или по токену API. Без заголовка запрос проходит
+    дальше без каких-либо дополнительных действий, а при выключенной
+    настройке middleware не подключается.
+    """
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = request.META.get(TOKEN_HEADER)
+        if not token:
+            return self.get_response(request)
+        user = get_profile_user(token, get_request_user(request))
+        if user is None:
+            return self.get_response(request)
+        return self.profile(request, user)
+
+    def profile(self, request, user):
+        sampler = StackSampler(
+            threading.get_ident(),
+            settings.REQUEST_PROFILING_SAMPLE_INTERVAL)
+        profiler = cProfile.Profile()
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            sampler.start()
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+                sampler.stop()
+            duration = (time.perf_counter() - started) * 1000
+
+        root = get_profiles_root()
+        name = uuid.uuid4().hex
+        stats_file, stacks_file = f'{name}.pstats', f'{name}.collapsed'
+        profiler.dump_stats(root / stats_file)
+        sampler.dump(root / stacks_file)
+        profile = RequestProfile.objects.create(
+            user=user,
+            method=request.method,
+            path=request.get_full_path()[:2048],
+            status_code=response.status_code,
+            duration_ms=duration,
+            query_count=len(queries),
+            stats_file=stats_file,
+            stacks_file=stacks_file)
+        trim_profiles()
+        response['X-Profile-Id'] = profile.pk
+        return response
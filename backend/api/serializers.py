@@ -1,15 +1,40 @@
 import base64
+from collections import defaultdict
+from contextlib import contextmanager
 
+from django.conf import settings
 from django.core.files.base import ContentFile
-from django.shortcuts import get_object_or_404
-from django.db import transaction
-from django.db.models import F
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
+from rest_framework.settings import api_settings
 
 from users.models import Subscription, User
-from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingCart, Tag)
+from recipes import registry
+from recipes.models import (MAX_SERVINGS, MIN_VALUE, Favorites, Ingredient,
+                            MealPlan, Recipe, RecipeIngredient, ShoppingCart,
+                            Tag)
+from recipes.nutrition import load_table, recipe_totals
+from recipes.planning import current_week, forget_recipes
+from .models import ImageUpload
+from .uploads import open_upload
+
+MAX_BULK_RECIPES = 500
+MAX_BULK_PLANS = 200
+SHORT_CARD_FIELDS = ('id', 'name', 'image', 'cooking_time')
+DUPLICATE_TEXT_ERROR = 'Такой рецепт уже существует. Измените описание.'
+
+
+@contextmanager
+def unique_text():
+    """Превращает гонку за уникальное описание в ошибку валидации."""
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError:
+        raise serializers.ValidationError(DUPLICATE_TEXT_ERROR)
 
 
 class Base64ImageField(serializers.ImageField):
@@ -25,7 +50,46 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
-class UserSerializer(UserSerializer):
+class RegistryRelatedField(serializers.PrimaryKeyRelatedField):
+    """Связь по первичному ключу, проверяемая по справочнику в памяти."""
+
+    def __init__(self, registry, **kwargs):
+        self.registry = registry
+        kwargs.setdefault('queryset', registry.model.objects.all())
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        try:
+            obj = self.registry.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+def is_selected(name, fields=None, omit=None):
+    """Нужно ли поле с учётом параметров ?fields= и ?omit=."""
+    return (fields is None or name in fields) and name not in (omit or ())
+
+
+class DynamicFieldsMixin:
+    """Сериализатор, из которого можно убрать часть полей.
+
+    Параметры fields и omit передаются аргументами конструктора,
+    а не через контекст: контекст общий с вложенными сериализаторами.
+    """
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in list(self.fields):
+            if not is_selected(name, fields, omit):
+                self.fields.pop(name)
+
+
+class UserSerializer(DynamicFieldsMixin, UserSerializer):
     """Сериализатор для списка пользователей и профиля пользователя."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -36,6 +100,9 @@ class UserSerializer(UserSerializer):
                   'first_name', 'last_name', 'is_subscribed')
 
     def get_is_subscribed(self, obj):
+        is_subscribed = getattr(obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and Subscription.objects.filter(
@@ -70,16 +137,34 @@ class IngredientSerializer(serializers.ModelSerializer):
 class RecipeIngredientSerializer(serializers.ModelSerializer):
     """Сериализатор для списка ингредиентов с количеством для рецепта."""
 
-    id = serializers.ReadOnlyField(source='ingredient.id')
-    name = serializers.ReadOnlyField(source='ingredient.name')
-    measurement_unit = serializers.ReadOnlyField(
-        source='ingredient.measurement_unit')
+    id = serializers.ReadOnlyField(source='ingredient_id')
+    name = serializers.SerializerMethodField()
+    measurement_unit = serializers.SerializerMethodField()
 
     class Meta:
         model = RecipeIngredient
         fields = ('id', 'name',
                   'measurement_unit', 'amount')
 
+    def get_ingredient(self, obj):
+        return registry.ingredients.get(obj.ingredient_id) or obj.ingredient
+
+    def get_name(self, obj):
+        return self.get_ingredient(obj).name
+
+    def get_measurement_unit(self, obj):
+        return self.get_ingredient(obj).measurement_unit
+
+
+class RecipeIngredientAmountSerializer(serializers.ModelSerializer):
+    """Ингредиент рецепта в свёрнутом виде: только id и количество."""
+
+    id = serializers.ReadOnlyField(source='ingredient_id')
+
+    class Meta:
+        model = RecipeIngredient
+        fields = ('id', 'amount')
+
 
 class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания ингредиента в рецепте."""
@@ -90,6 +175,12 @@ class RecipeIngredientCreateSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
         fields = ('id', 'amount')
 
+    def validate_id(self, value):
+        if registry.ingredients.get(value) is None:
+            raise serializers.ValidationError(
+                f'Ингредиент с id={value} не найден.')
+        return value
+
 
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для списка рецептов без ингредиентов."""
@@ -104,8 +195,239 @@ class RecipeSerializer(serializers.ModelSerializer):
                   'image', 'cooking_time')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
-    """Сериализатор для чтения рецептов."""
+def image_url(name, request=None):
+    """Ссылка на изображение рецепта, как её отдаёт Base64ImageField."""
+    if not name:
+        return None
+    if not api_settings.UPLOADED_FILES_USE_URL:
+        return name
+    url = Recipe._meta.get_field('image').storage.url(name)
+    if request is not None:
+        return request.build_absolute_uri(url)
+    return url
+
+
+def short_card(row, request=None):
+    recipe_id, name, image, cooking_time = row
+    return {'id': recipe_id, 'name': name,
+            'image': image_url(image, request),
+            'cooking_time': cooking_time}
+
+
+def short_recipe_cards(queryset, request=None):
+    """То же, что RecipeSerializer(many=True).data, но без создания
+    объектов моделей и полей сериализатора."""
+    return [short_card(row, request)
+            for row in queryset.values_list(*SHORT_CARD_FIELDS)]
+
+
+def recipe_cards_by_author(author_ids, limit=None, request=None):
+    """Карточки рецептов нескольких авторов одним запросом.
+
+    С limit каждому автору достаются только его последние рецепты:
+    нумерация идёт оконной функцией, лишние строки отсекает
+    внешний запрос.
+    """
+    queryset = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is None:
+        rows = queryset.values_list('author_id', *SHORT_CARD_FIELDS)
+    else:
+        ranked = queryset.annotate(card_rank=Window(
+            RowNumber(), partition_by=[F('author_id')],
+            order_by=F('pub_date').desc())).order_by().values_list(
+            'author_id', *SHORT_CARD_FIELDS, 'card_rank')
+        sql, params = ranked.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT * FROM ({sql}) ranked WHERE card_rank <= %s '
+                f'ORDER BY card_rank', (*params, limit))
+            rows = [row[:-1] for row in cursor.fetchall()]
+    cards = defaultdict(list)
+    for author_id, *row in rows:
+        cards[author_id].append(short_card(row, request))
+    return cards
+
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка рецептов для массовых операций."""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=MAX_BULK_RECIPES)
+
+    def validate_recipes(self, recipes):
+        return list(dict.fromkeys(recipes))
+
+
+class ServingsSerializer(serializers.Serializer):
+    """Число порций рецепта в списке покупок."""
+
+    servings = serializers.IntegerField(
+        min_value=MIN_VALUE, max_value=MAX_SERVINGS)
+
+
+@contextmanager
+def unique_plan():
+    """Повтор рецепта в том же приёме пищи — ошибка валидации."""
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError:
+        raise serializers.ValidationError(
+            {'errors': 'Рецепт уже запланирован на этот приём пищи.'})
+
+
+class MealPlanSerializer(serializers.ModelSerializer):
+    """Сериализатор записи плана питания.
+
+    Рецепт передаётся первичным ключом, а возвращается карточкой.
+    """
+
+    recipe = serializers.PrimaryKeyRelatedField(
+        queryset=Recipe.objects.visible().only(*SHORT_CARD_FIELDS))
+    servings = serializers.IntegerField(
+        min_value=MIN_VALUE, max_value=MAX_SERVINGS,
+        allow_null=True, required=False)
+
+    class Meta:
+        model = MealPlan
+        fields = ('id', 'date', 'meal', 'recipe', 'servings')
+
+    def create(self, validated_data):
+        with unique_plan():
+            return super().create(validated_data)
+
+    def update(self, instance, validated_data):
+        with unique_plan():
+            return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        recipe = instance.recipe
+        data['recipe'] = short_card(
+            (recipe.id, recipe.name, recipe.image.name, recipe.cooking_time),
+            self.context.get('request'))
+        return data
+
+
+class MealPlanItemSerializer(serializers.Serializer):
+    """Запись плана в массовом изменении; с id — изменение записи."""
+
+    id = serializers.IntegerField(min_value=1, required=False)
+    date = serializers.DateField()
+    meal = serializers.ChoiceField(choices=MealPlan.MEALS)
+    recipe = serializers.IntegerField(min_value=1)
+    servings = serializers.IntegerField(
+        min_value=MIN_VALUE, max_value=MAX_SERVINGS,
+        allow_null=True, default=None)
+
+
+class MealPlanBulkSerializer(serializers.Serializer):
+    """Массовое изменение плана: записи без id создаются, с id —
+    заменяются целиком, delete — удаляемые записи.
+
+    Рецепты и принадлежность записей пользователю проверяются
+    двумя запросами на весь пакет.
+    """
+
+    plans = MealPlanItemSerializer(many=True, required=False)
+    delete = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False,
+        max_length=MAX_BULK_PLANS)
+
+    def validate_plans(self, plans):
+        if len(plans) > MAX_BULK_PLANS:
+            raise serializers.ValidationError(
+                f'Не больше {MAX_BULK_PLANS} записей за раз.')
+        return plans
+
+    def validate(self, data):
+        plans = data.setdefault('plans', [])
+        delete = data['delete'] = list(dict.fromkeys(data.get('delete', [])))
+        if not plans and not delete:
+            raise serializers.ValidationError('Нет изменений.')
+        plan_ids = [plan['id'] for plan in plans if 'id' in plan]
+        if len(set(plan_ids)) != len(plan_ids) or set(plan_ids) & set(
+                delete):
+            raise serializers.ValidationError(
+                'Каждая запись плана может меняться один раз.')
+        if plan_ids or delete:
+            owned = set(MealPlan.objects.filter(
+                user=self.context['request'].user,
+                id__in=plan_ids + delete).values_list('id', flat=True))
+            missing = set(plan_ids + delete) - owned
+            if missing:
+                raise serializers.ValidationError(
+                    f'Записи плана не найдены: '
+                    f'{", ".join(map(str, sorted(missing)))}.')
+        recipes = Recipe.objects.visible().only(*SHORT_CARD_FIELDS).in_bulk(
+            {plan['recipe'] for plan in plans})
+        missing = {plan['recipe'] for plan in plans} - set(recipes)
+        if missing:
+            raise serializers.ValidationError(
+                f'Рецепты не найдены: '
+                f'{", ".join(map(str, sorted(missing)))}.')
+        for plan in plans:
+            plan['recipe'] = recipes[plan['recipe']]
+        return data
+
+
+class MealPlanRangeSerializer(serializers.Serializer):
+    """Период сводки ингредиентов; по умолчанию текущая неделя."""
+
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        week = current_week()
+        data.setdefault('start', week[0])
+        data.setdefault('end', week[1])
+        if data['start'] > data['end']:
+            raise serializers.ValidationError(
+                'Начало периода позже его конца.')
+        return data
+
+
+class ChangesQuerySerializer(serializers.Serializer):
+    """Параметры запроса ленты изменений."""
+
+    since = serializers.IntegerField(min_value=0, required=False)
+    limit = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.CHANGES_PAGE_SIZE,
+        default=settings.CHANGES_PAGE_SIZE)
+
+
+class ImageUploadSerializer(serializers.ModelSerializer):
+    """Сериализатор для частичной загрузки изображения."""
+
+    size = serializers.IntegerField(
+        min_value=1, max_value=settings.IMAGE_UPLOAD_MAX_SIZE)
+    is_complete = serializers.BooleanField(read_only=True)
+
+    class Meta:
+        model = ImageUpload
+        fields = ('token', 'size', 'offset', 'is_complete', 'created')
+        read_only_fields = ('offset', 'created')
+
+    def validate(self, data):
+        user = self.context['request'].user
+        if (user.image_uploads.count()
+                >= settings.IMAGE_UPLOAD_MAX_ACTIVE):
+            raise serializers.ValidationError(
+                'Слишком много незавершённых загрузок.')
+        return data
+
+
+class RecipeReadSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    """Сериализатор для чтения рецептов.
+
+    Если передан expand, связи не из этого множества отдаются
+    в свёрнутом виде: автор и теги — идентификаторами, ингредиенты —
+    парами id и amount.
+    """
 
     tags = TagSerializer(read_only=True, many=True)
     author = UserSerializer(read_only=True)
@@ -122,7 +444,24 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                   'ingredients', 'is_favorited',
                   'is_in_shopping_cart',
                   'name', 'image', 'text',
-                  'cooking_time')
+                  'cooking_time', 'servings', 'calories', 'proteins',
+                  'fats', 'carbohydrates')
+
+    def __init__(self, *args, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if expand is None:
+            return
+        collapsed = {
+            'author': lambda: serializers.PrimaryKeyRelatedField(
+                read_only=True),
+            'tags': lambda: serializers.PrimaryKeyRelatedField(
+                read_only=True, many=True),
+            'ingredients': lambda: RecipeIngredientAmountSerializer(
+                read_only=True, many=True, source='recipe_ingredient'),
+        }
+        for name, field in collapsed.items():
+            if name in self.fields and name not in expand:
+                self.fields[name] = field()
 
     def get_image(self, obj):
         if obj.image:
@@ -130,6 +469,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
         return None
 
     def get_is_favorited(self, obj):
+        is_favorited = getattr(obj, 'is_favorited', None)
+        if is_favorited is not None:
+            return is_favorited
         return (
             self.context.get('request').user.is_authenticated
             and Favorites.objects.filter(
@@ -137,6 +479,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
                 recipe=obj).exists())
 
     def get_is_in_shopping_cart(self, obj):
+        is_in_shopping_cart = getattr(obj, 'is_in_shopping_cart', None)
+        if is_in_shopping_cart is not None:
+            return is_in_shopping_cart
         return (
             self.context.get('request').user.is_authenticated
             and ShoppingCart.objects.filter(
@@ -148,16 +493,25 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания, изменения и удаления рецепта."""
 
     ingredients = RecipeIngredientCreateSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
-        queryset=Tag.objects.all(), many=True)
-    image = Base64ImageField()
+    tags = RegistryRelatedField(
+        registry=registry.tags, many=True)
+    image = Base64ImageField(required=False)
+    image_upload = serializers.UUIDField(write_only=True, required=False)
     author = UserSerializer(read_only=True)
 
     class Meta:
         model = Recipe
         fields = ('id', 'ingredients', 'tags',
-                  'image', 'name', 'text',
-                  'cooking_time', 'author')
+                  'image', 'image_upload', 'name', 'text',
+                  'cooking_time', 'servings', 'author')
+
+    def validate_image_upload(self, token):
+        upload = ImageUpload.objects.filter(
+            token=token, user=self.context['request'].user).first()
+        if upload is None or not upload.is_complete:
+            raise serializers.ValidationError(
+                'Загрузка не найдена или ещё не завершена.')
+        return upload
 
     def validate_tags(self, tags):
         if not tags:
@@ -172,76 +526,113 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         return ingredients
 
     def validate(self, data):
+        if 'image' in data and 'image_upload' in data:
+            raise serializers.ValidationError(
+                'Передайте либо image, либо image_upload.')
+        if self.instance is None and not (
+                'image' in data or 'image_upload' in data):
+            raise serializers.ValidationError(
+                {'image': ['Обязательное поле.']})
+
         text = data.get('text')
-        if self.instance and text == self.instance.text:
+        if text is None or self.instance and text == self.instance.text:
             return data
 
-        if Recipe.objects.filter(text=text).exists():
+        recipes = Recipe.objects.exclude(
+            pk=getattr(self.instance, 'pk', None))
+        if recipes.same_text(text).exists():
+            raise serializers.ValidationError(DUPLICATE_TEXT_ERROR)
+        distance = settings.RECIPE_NEAR_DUPLICATE_DISTANCE
+        if (distance is not None
+                and recipes.similar_text(text, distance).exists()):
             raise serializers.ValidationError(
-                'Такой рецепт уже существует. Измените описание.')
+                'Рецепт слишком похож на уже существующий. '
+                'Измените описание.')
         return data
 
-    def create_ingredients(self, recipe, ingredients_data):
+    def get_amounts(self, ingredients_data):
+        amounts = {}
         for ingredient_data in ingredients_data:
             ingredient_id = ingredient_data['id']
-            amount = ingredient_data['amount']
-            existing_ingredient = RecipeIngredient.objects.filter(
-                recipe=recipe, ingredient_id=ingredient_id).first()
-            if existing_ingredient:
-                existing_ingredient.amount = F('amount') + amount
-                existing_ingredient.save()
-            else:
-                ingredient = get_object_or_404(Ingredient, pk=ingredient_id)
-                RecipeIngredient.objects.create(
-                    recipe=recipe, ingredient=ingredient, amount=amount)
+            amounts[ingredient_id] = (
+                amounts.get(ingredient_id, 0) + ingredient_data['amount'])
+        return amounts
+
+    def set_nutrition(self, recipe, amounts):
+        # Итоги считаются до сохранения рецепта, отдельный UPDATE
+        # не нужен.
+        totals = recipe_totals(amounts, load_table(amounts))
+        for name, value in totals.items():
+            setattr(recipe, name, value)
+
+    def create_ingredients(self, recipe, amounts):
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient_id,
+                             amount=amount)
+            for ingredient_id, amount in amounts.items())
+
+    @contextmanager
+    def uploaded_image(self, validated_data):
+        """Подставляет файл частичной загрузки вместо base64."""
+        upload = validated_data.pop('image_upload', None)
+        if upload is None:
+            yield
+            return
+        with open_upload(upload) as image:
+            validated_data['image'] = image
+            yield
 
     @transaction.atomic
     def create(self, validated_data):
+        with self.uploaded_image(validated_data):
+            return self.create_recipe(validated_data)
+
+    def create_recipe(self, validated_data):
         validated_data['name'] = validated_data['name'].capitalize()
         tags_data = validated_data.pop('tags')
-        ingredients_data = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
+        amounts = self.get_amounts(validated_data.pop('ingredients'))
+        recipe = Recipe(**validated_data)
+        self.set_nutrition(recipe, amounts)
+        with unique_text():
+            recipe.save(force_insert=True)
         recipe.tags.set(tags_data)
-        self.create_ingredients(recipe, ingredients_data)
+        self.create_ingredients(recipe, amounts)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
+        with self.uploaded_image(validated_data):
+            return self.update_recipe(instance, validated_data)
+
+    def update_recipe(self, instance, validated_data):
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time)
+        instance.servings = validated_data.get(
+            'servings', instance.servings)
 
         if 'name' in validated_data:
             validated_data['name'] = validated_data['name'].capitalize()
 
         if 'image' in validated_data:
-            if instance.image:
-                instance.image.delete()
+            # Старый файл удалит сборщик после коммита.
             instance.image = validated_data['image']
         tags_data = validated_data.get('tags')
-        ingredients_data = validated_data.get('ingredients')
 
         if tags_data is not None:
             instance.tags.set(tags_data)
 
+        if 'ingredients' in validated_data or 'servings' in validated_data:
+            # Сводки планов питания с этим рецептом устарели.
+            forget_recipes([instance.pk])
         if 'ingredients' in validated_data:
-            ingredients_data = validated_data.pop('ingredients')
+            amounts = self.get_amounts(validated_data.pop('ingredients'))
             RecipeIngredient.objects.filter(recipe=instance).delete()
-            for ingredient_data in ingredients_data:
-                ingredient_id = ingredient_data['id']
-                amount = ingredient_data['amount']
-                existing_ingredient = RecipeIngredient.objects.filter(
-                    recipe=instance, ingredient_id=ingredient_id).first()
-                if existing_ingredient:
-                    existing_ingredient.amount = F('amount') + amount
-                    existing_ingredient.save()
-                else:
-                    ingredient = get_object_or_404(
-                        Ingredient, pk=ingredient_id)
-                    RecipeIngredient.objects.create(
-                        recipe=instance, ingredient=ingredient, amount=amount)
-        instance = super().update(instance, validated_data)
+            self.create_ingredients(instance, amounts)
+            self.set_nutrition(instance, amounts)
+        with unique_text():
+            instance = super().update(instance, validated_data)
         return instance
 
     def to_representation(self, instance):
@@ -250,7 +641,21 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                                     context={'request': request}).data
 
 
-class BaseSubscriptionSerializer(serializers.ModelSerializer):
+def get_recipes_limit(request):
+    """recipes_limit из запроса, не больше RECIPES_LIMIT_MAX."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if not recipes_limit:
+        return settings.RECIPES_LIMIT_MAX
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise serializers.ValidationError(
+            {'recipes_limit': 'Должно быть целым числом.'})
+    return min(max(recipes_limit, 0), settings.RECIPES_LIMIT_MAX)
+
+
+class BaseSubscriptionSerializer(DynamicFieldsMixin,
+                                 serializers.ModelSerializer):
     """Базовый сериализатор для подписок."""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -266,23 +671,30 @@ class BaseSubscriptionSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         user = self.context.get('request').user
         author_obj = obj.author if hasattr(obj, 'author') else obj
+        is_subscribed = getattr(author_obj, 'is_subscribed', None)
+        if is_subscribed is not None:
+            return is_subscribed
         return Subscription.objects.filter(
             user=user,
             author=author_obj).exists()
 
     def get_recipes_count(self, obj):
         author_obj = obj.author if hasattr(obj, 'author') else obj
+        recipes_count = getattr(author_obj, 'recipes_count', None)
+        if recipes_count is not None:
+            return recipes_count
         return author_obj.recipes.count()
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.query_params.get('recipes_limit')
         author_obj = obj.author if hasattr(obj, 'author') else obj
+        cards = self.context.get('recipe_cards')
+        if cards is not None:
+            return cards.get(author_obj.pk, [])
+        recipes_limit = get_recipes_limit(self.context.get('request'))
         recipes = author_obj.recipes.all()
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
-        serializer = RecipeSerializer(recipes, many=True)
-        return serializer.data
+        if recipes_limit is not None:
+            recipes = recipes[:recipes_limit]
+        return short_recipe_cards(recipes)
 
 
 class SubscriptionsListSerializer(BaseSubscriptionSerializer):
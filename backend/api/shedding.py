@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+REQUEST_START_HEADER = 'HTTP_X_REQUEST_START'
+
+
+def queue_time(request):
+    """Сколько секунд запрос ждал воркера после прихода на nginx.
+
+    nginx передаёт время в заголовке X-Request-Start: t=<секунды>;
+    другие прокси пишут миллисекунды или микросекунды.
+    """
+    value = request.META.get(REQUEST_START_HEADER, '')
+    try:
+        started = float(value.removeprefix('t='))
+    except ValueError:
+        return None
+    while started > 1e11:
+        started /= 1000
+    return time.time() - started
+
+
+class LoadSheddingMiddleware:
+    """Сразу отвечает 503, если запрос слишком долго стоял в очереди.
+
+    Клиент к этому времени, скорее всего, уже не ждёт ответа, а его
+    обработка задержала бы следующие запросы ещё сильнее.
+    """
+
+    def __init__(self, get_response):
+        if not settings.LOAD_SHEDDING_QUEUE_TIME:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        waited = queue_time(request)
+        if (waited is not None
+                and waited > settings.LOAD_SHEDDING_QUEUE_TIME
+                and not request.path.startswith(
+                    settings.LOAD_SHEDDING_EXEMPT_PATHS)):
+            response = JsonResponse(
+                {'detail': 'Сервер перегружен, повторите запрос позже.'},
+                status=503)
+            response['Retry-After'] = str(settings.LOAD_SHEDDING_RETRY_AFTER)
+            return response
+        return self.get_response(request)
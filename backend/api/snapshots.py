@@ -0,0 +1,115 @@
+import gzip
+import hashlib
+import json
+import logging
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+
+from recipes.models import Ingredient, Tag
+from .renderers import FastJSONRenderer
+from .serializers import IngredientSerializer, TagSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'manifest.json'
+KEEP_VERSIONS = 3
+
+CATALOGUES = {
+    'tags': (Tag, TagSerializer),
+    'ingredients': (Ingredient, IngredientSerializer),
+}
+
+_manifest_cache = {}
+
+
+def snapshot_root():
+    return Path(settings.CATALOGUE_SNAPSHOT_ROOT)
+
+
+def write_snapshot(root, name, content):
+    digest = hashlib.sha256(content).hexdigest()[:16]
+    filename = f'{name}.{digest}.json'
+    path = root / filename
+    if not path.exists():
+        (root / f'{filename}.gz').write_bytes(
+            gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            (root / f'{filename}.br').write_bytes(
+                brotli.compress(content, quality=11))
+        temporary = root / f'.{filename}.tmp'
+        temporary.write_bytes(content)
+        temporary.replace(path)
+    else:
+        # Старые снимки удаляются по времени изменения.
+        path.touch()
+    return filename
+
+
+def remove_old_snapshots(root, name):
+    snapshots = sorted(root.glob(f'{name}.*.json'),
+                       key=lambda path: path.stat().st_mtime, reverse=True)
+    for path in snapshots[KEEP_VERSIONS:]:
+        for suffix in ('', '.gz', '.br'):
+            Path(f'{path}{suffix}').unlink(missing_ok=True)
+
+
+def build_snapshots():
+    """Записывает снимки справочников и манифест со ссылками на них."""
+    root = snapshot_root()
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = {}
+    for name, (model, serializer_class) in CATALOGUES.items():
+        data = serializer_class(model.objects.all(), many=True).data
+        filename = write_snapshot(
+            root, name, FastJSONRenderer().render(data))
+        manifest[name] = settings.CATALOGUE_SNAPSHOT_URL + filename
+        remove_old_snapshots(root, name)
+    temporary = root / f'.{MANIFEST}.tmp'
+    temporary.write_text(json.dumps(manifest))
+    temporary.replace(root / MANIFEST)
+    return manifest
+
+
+def get_manifest():
+    """Текущий манифест; перечитывается только при изменении файла."""
+    if not settings.CATALOGUE_SNAPSHOT_ROOT:
+        return {}
+    path = snapshot_root() / MANIFEST
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    if _manifest_cache.get('mtime') != mtime:
+        _manifest_cache.update(
+            mtime=mtime, manifest=json.loads(path.read_text()))
+    return _manifest_cache['manifest']
+
+
+def rebuild_after_commit():
+    try:
+        build_snapshots()
+    except OSError:
+        logger.exception('Не удалось обновить снимки справочников')
+
+
+def rebuild_snapshots(sender, **kwargs):
+    """Пересобирает снимки после коммита, один раз на транзакцию.
+
+    Массовая правка справочника шлёт сигнал на каждую строку. Уже
+    запланированную пересборку видно в очереди on_commit соединения;
+    при откате транзакции очередь очищается вместе с ней.
+    """
+    if not settings.CATALOGUE_SNAPSHOT_ROOT:
+        return
+    connection = transaction.get_connection()
+    if any(callback is rebuild_after_commit
+           for _, callback in connection.run_on_commit):
+        return
+    transaction.on_commit(rebuild_after_commit)
@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+CACHE_PREFIX = 'throttle:'
+
+
+def parse_rate(rate):
+    """'30/min' -> (30, 60), как в SimpleRateThrottle."""
+    number, period = rate.split('/')
+    return int(number), PERIODS[period[0]]
+
+
+class TokenBucket:
+    """Корзины токенов в памяти процесса.
+
+    Каждый процесс считает сам, поэтому при N воркерах допустимая
+    частота для клиента в худшем случае в N раз выше. Хранится не
+    больше THROTTLE_MAX_BUCKETS корзин, давно не использованные
+    вытесняются.
+    """
+
+    def __init__(self):
+        self.buckets = OrderedDict()
+        self.lock = threading.Lock()
+
+    def take(self, key, capacity, period):
+        """Забирает токен; возвращает 0 или сколько секунд ждать."""
+        now = time.monotonic()
+        refill = capacity / period
+        with self.lock:
+            tokens, updated = self.buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * refill)
+            wait = 0 if tokens >= 1 else (1 - tokens) / refill
+            if not wait:
+                tokens -= 1
+            self.buckets[key] = (tokens, now)
+            while len(self.buckets) > settings.THROTTLE_MAX_BUCKETS:
+                self.buckets.popitem(last=False)
+        return wait
+
+
+class SharedWindow:
+    """Общие для всех процессов счётчики в кэше Django.
+
+    В API кэша нет сравнения с обменом, поэтому корзина заменена
+    фиксированным окном на атомарных add и incr.
+    """
+
+    def take(self, key, capacity, period):
+        cache = caches[settings.THROTTLE_CACHE_ALIAS]
+        now = time.time()
+        window = int(now // period)
+        cache_key = f'{CACHE_PREFIX}{key}:{window}'
+        cache.add(cache_key, 0, period)
+        try:
+            count = cache.incr(cache_key)
+        except ValueError:
+            # Ключ истёк между add и incr.
+            cache.add(cache_key, 1, period)
+            count = 1
+        return 0 if count <= capacity else (window + 1) * period - now
+
+
+local_buckets = TokenBucket()
+
+
+class ScopedThrottle(BaseThrottle):
+    """Ограничение частоты дорогих действий.
+
+    Вьюсет сопоставляет действиям области в throttle_scopes, частоты
+    областей задаются в DEFAULT_THROTTLE_RATES. Действия без области
+    и области без частоты не ограничиваются.
+    """
+
+    delay = None
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scopes', {}).get(
+            getattr(view, 'action', None))
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope)
+        if rate is None:
+            return True
+        if request.user.is_authenticated:
+            ident = f'user:{request.user.pk}'
+        else:
+            ident = f'ip:{self.get_ident(request)}'
+        store = (SharedWindow() if settings.THROTTLE_CACHE_ALIAS
+                 else local_buckets)
+        self.delay = store.take(f'{scope}:{ident}', *parse_rate(rate))
+        return not self.delay
+
+    def wait(self):
+        return self.delay
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+QUERY_CANCELED = '57014'
+
+
+@contextmanager
+def statement_timeout(milliseconds):
+    """Ограничивает время каждого SQL-запроса внутри блока (PostgreSQL).
+
+    Блок выполняется в транзакции с SET LOCAL: таймаут снимается сам
+    при её завершении и не переживает запрос даже при постоянных
+    соединениях. Поэтому подходит только для действий на чтение.
+    """
+    if not milliseconds or connection.vendor != 'postgresql':
+        yield
+        return
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL statement_timeout = %s',
+                           [milliseconds])
+        yield
+
+
+def is_query_canceled(error):
+    return getattr(error.__cause__, 'pgcode', None) == QUERY_CANCELED
@@ -0,0 +1,72 @@
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from .models import ImageUpload
+
+READ_SIZE = 64 * 1024
+
+
+def upload_path(upload):
+    return Path(settings.IMAGE_UPLOAD_ROOT) / f'{upload.token.hex}.part'
+
+
+def write_chunk(upload, stream, length):
+    """Пишет часть файла из потока запроса с текущего смещения.
+
+    Возвращает число записанных байт: если клиент оборвал соединение,
+    полученная часть сохраняется и загрузку можно продолжить.
+    """
+    path = upload_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    remaining = length
+    descriptor = os.open(path, os.O_WRONLY | os.O_CREAT, 0o600)
+    with os.fdopen(descriptor, 'wb') as file:
+        # Хвост от оборванного запроса перезаписывается.
+        file.seek(upload.offset)
+        while remaining:
+            chunk = stream.read(min(READ_SIZE, remaining))
+            if not chunk:
+                break
+            file.write(chunk)
+            remaining -= len(chunk)
+        file.truncate()
+    return length - remaining
+
+
+def identify_image(upload):
+    """Имя файла для готового изображения или None, если это не оно."""
+    try:
+        with Image.open(upload_path(upload)) as image:
+            image.verify()
+            image_format = image.format
+    except Exception:
+        return None
+    return f'{upload.token.hex}.{image_format.lower()}'
+
+
+@contextmanager
+def open_upload(upload):
+    """Файл загрузки для ImageField; запись удаляется после коммита."""
+    with open(upload_path(upload), 'rb') as file:
+        yield File(file, name=upload.filename)
+    transaction.on_commit(upload.delete)
+
+
+def remove_expired_uploads():
+    expired = ImageUpload.objects.filter(
+        created__lt=timezone.now() - timedelta(
+            seconds=settings.IMAGE_UPLOAD_TTL))
+    for upload in expired[:100]:
+        upload.delete()
+
+
+def delete_upload_file(sender, instance, **kwargs):
+    upload_path(instance).unlink(missing_ok=True)
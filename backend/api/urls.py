@@ -1,17 +1,23 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                    TagViewSet)
+from .views import (CatalogueView, ChangeView, CustomUserViewSet,
+                    EventTicketView, ImageUploadViewSet, IngredientViewSet,
+                    MealPlanViewSet, RecipeViewSet, TagViewSet)
 
 router = DefaultRouter()
 router.register('tags', TagViewSet, basename='tags')
 router.register('ingredients', IngredientViewSet, basename='ingredients')
 router.register('recipes', RecipeViewSet, basename='recipes')
 router.register('users', CustomUserViewSet, basename='users')
+router.register('uploads', ImageUploadViewSet, basename='uploads')
+router.register('meal_plans', MealPlanViewSet, basename='meal_plans')
 
 
 urlpatterns = [
+    path('catalogue/', CatalogueView.as_view(), name='catalogue'),
+    path('changes/', ChangeView.as_view(), name='changes'),
+    path('events/ticket/', EventTicketView.as_view(), name='event-ticket'),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
     path('', include('djoser.urls')),
@@ -1,53 +1,281 @@
-from django.db.models import Sum
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import (BooleanField, Count, Exists, OuterRef,
+                              Prefetch, Q, Value)
 from django.shortcuts import HttpResponse, get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from rest_framework import permissions, status, viewsets
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from foodgram.pagination import EstimatedCountPagination
+from users.deletion import schedule_user_deletion
 from users.models import Subscription, User
-from .filters import IngredientFilter, RecipeFilter
-from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
+from .changes import (TOPICS, as_event, get_horizon, latest_cursor,
+                      read_changes, record)
+from .events import make_ticket
+from .filters import (IngredientFilter, MealPlanFilter, RecipeFilter,
+                      UserFilter)
+from recipes.models import (Favorites, Ingredient, MealPlan, Recipe,
                             ShoppingCart, Tag)
+from recipes.planning import forget_weeks, plan_summary
+from recipes.shopping import cart_ingredients, display_amount, format_amount
+from .models import Change, ImageUpload
 from .permissions import IsOwnerOrAdminOrReadOnly
-from .serializers import (IngredientSerializer, RecipeCreateSerializer,
+from .serializers import (SHORT_CARD_FIELDS, ChangesQuerySerializer,
+                          ImageUploadSerializer,
+                          IngredientSerializer, MealPlanBulkSerializer,
+                          MealPlanRangeSerializer, MealPlanSerializer,
+                          RecipeCreateSerializer, RecipeIdsSerializer,
                           RecipeReadSerializer, RecipeSerializer,
-                          SubscriptionsListSerializer, SubscriptionsSerializer,
-                          TagSerializer, UserSerializer)
+                          ServingsSerializer,
+                          SubscriptionsListSerializer,
+                          SubscriptionsSerializer, TagSerializer,
+                          UserSerializer, get_recipes_limit, is_selected,
+                          recipe_cards_by_author, short_recipe_cards,
+                          unique_plan)
+from .snapshots import get_manifest
+from .timeouts import is_query_canceled, statement_timeout
+from .uploads import identify_image, remove_expired_uploads, write_chunk
 
+READ_COLUMNS = ('name', 'image', 'text', 'cooking_time', 'servings',
+                'calories', 'proteins', 'fats', 'carbohydrates')
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+
+def insert_ignoring_conflicts(model, **values):
+    """Одна вставка строки, которая при нарушении уникальности ничего
+    не делает; возвращает, добавлена ли строка.
+
+    Без проверки существования заранее и без точки сохранения.
+    """
+    ops = connection.ops
+    fields = [model._meta.get_field(name) for name in values]
+    columns = ', '.join(ops.quote_name(field.column) for field in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{ops.insert_statement(ignore_conflicts=True)} '
+            f'{ops.quote_name(model._meta.db_table)} ({columns}) '
+            f'VALUES ({placeholders}) '
+            f'{ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)}',
+            [field.get_db_prep_save(value, connection)
+             for field, value in zip(fields, values.values())])
+        return cursor.rowcount == 1
+
+
+def delete_returning_recipes(model, user_pk, recipe_ids):
+    """Один DELETE строк пользователя по ID рецептов без сигналов;
+    возвращает ID рецептов удалённых строк.
+
+    На PostgreSQL ID возвращает сам DELETE, на остальных базах они
+    читаются тем же условием в текущей транзакции перед удалением.
+    """
+    items = model.objects.filter(user_id=user_pk, recipe_id__in=recipe_ids)
+    if connection.vendor != 'postgresql':
+        removed = list(items.values_list('recipe_id', flat=True))
+        if removed:
+            items._raw_delete(items.db)
+        return removed
+    ops = connection.ops
+    column = ops.quote_name(model._meta.get_field('recipe').column)
+    user_column = ops.quote_name(model._meta.get_field('user').column)
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {ops.quote_name(model._meta.db_table)} '
+            f'WHERE {user_column} = %s AND {column} IN ({placeholders}) '
+            f'RETURNING {column}',
+            [user_pk, *recipe_ids])
+        return [row[0] for row in cursor.fetchall()]
+
+
+class SnapshotLinkMixin:
+    """Ссылка на статический снимок справочника в ответе на список."""
+
+    catalogue = None
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        url = get_manifest().get(self.catalogue)
+        if url and self.action == 'list' and not request.query_params:
+            response['Link'] = f'<{url}>; rel="alternate"'
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class FieldSelectionMixin:
+    """Передаёт сериализатору поля из параметров запроса.
+
+    Параметры перечисляются через запятую: ?fields=id,name.
+    """
+
+    selection_params = ('fields', 'omit')
+    selection_actions = ('list', 'retrieve')
+
+    def get_field_selection(self):
+        selection = {}
+        if self.action not in self.selection_actions:
+            return selection
+        for param in self.selection_params:
+            value = self.request.query_params.get(param)
+            if value is not None:
+                selection[param] = {
+                    name.strip() for name in value.split(',')
+                    if name.strip()}
+        return selection
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs.update(self.get_field_selection())
+        return super().get_serializer(*args, **kwargs)
+
+
+class StatementTimeoutMixin:
+    """Ограничивает время SQL-запросов отдельных действий.
+
+    statement_timeouts сопоставляет действиям миллисекунды; запрос,
+    отменённый по таймауту, превращается в ответ 503.
+    """
+
+    statement_timeouts = {}
+
+    def dispatch(self, request, *args, **kwargs):
+        action = self.action_map.get(request.method.lower())
+        with statement_timeout(self.statement_timeouts.get(action)):
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, OperationalError) and is_query_canceled(exc):
+            return Response(
+                {'detail': 'Запрос выполнялся слишком долго, '
+                           'повторите его позже.'},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={'Retry-After': '5'})
+        return super().handle_exception(exc)
+
+
+class TagViewSet(SnapshotLinkMixin, viewsets.ReadOnlyModelViewSet):
     """Вьюсет для просмотра тегов."""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    catalogue = 'tags'
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(SnapshotLinkMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет для просмотра ингредиентов."""
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    catalogue = 'ingredients'
     permission_classes = (permissions.AllowAny,)
     pagination_class = None
     filter_backends = (DjangoFilterBackend, )
     filterset_class = IngredientFilter
 
 
-class CustomUserViewSet(UserViewSet):
+class CatalogueView(APIView):
+    """Адреса актуальных снимков справочников."""
+
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        return Response(get_manifest())
+
+
+class EventTicketView(APIView):
+    """Билет для открытия потока событий из браузера (?ticket=)."""
+
+    permission_classes = (permissions.IsAuthenticated,)
+
+    def post(self, request):
+        return Response({'ticket': make_ticket(request.user, request.auth)})
+
+
+class ChangeView(APIView):
+    """Лента изменений для инкрементальной синхронизации клиентов.
+
+    Без since возвращает только текущий курсор. Анонимный клиент видит
+    общие изменения, авторизованный — ещё и изменения своих списков.
+    """
+
+    permission_classes = (permissions.AllowAny,)
+
+    def get(self, request):
+        serializer = ChangesQuerySerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        since = serializer.validated_data.get('since')
+        if since is None:
+            return Response({'next': latest_cursor(), 'has_more': False,
+                             'results': []})
+        if since < get_horizon():
+            return Response(
+                {'errors': 'Курсор устарел, нужна полная синхронизация.'},
+                status=status.HTTP_410_GONE)
+        visible = Q(user_pk__isnull=True)
+        if request.user.is_authenticated:
+            visible |= Q(user_pk=request.user.pk)
+        rows, cursor, has_more = read_changes(
+            Change.objects.filter(visible), since,
+            serializer.validated_data['limit'])
+        return Response({
+            'next': cursor,
+            'has_more': has_more,
+            'results': [
+                as_event(row['position'], row['topic'], row['object_id'],
+                         row['action'])
+                for row in rows],
+        })
+
+
+class CustomUserViewSet(StatementTimeoutMixin, FieldSelectionMixin,
+                        UserViewSet):
     """Вьюсет для работы с пользователями."""
 
-    queryset = User.objects.all()
+    queryset = User.objects.filter(is_active=True)
+    pagination_class = EstimatedCountPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = UserFilter
+    selection_params = ('omit',)
+    selection_actions = ('list', 'retrieve', 'me', 'subscriptions')
+    throttle_scopes = {'subscriptions': 'subscriptions'}
+    statement_timeouts = {'subscriptions': 5000}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        user = self.request.user
+        if self.action == 'retrieve' and user.is_authenticated:
+            queryset = queryset.annotate(is_subscribed=Exists(
+                Subscription.objects.filter(
+                    user=user, author=OuterRef('pk'))))
+        return queryset
+
+    def paginate_queryset(self, queryset):
+        # В списке подписки отмечаются уже после выборки страницы,
+        # чтобы подзапрос не попадал в COUNT(*).
+        page = super().paginate_queryset(queryset)
+        user = self.request.user
+        if self.action == 'list' and page and user.is_authenticated:
+            subscribed = set(Subscription.objects.filter(
+                user=user, author__in=page).values_list(
+                'author_id', flat=True))
+            for author in page:
+                author.is_subscribed = author.pk in subscribed
+        return page
+
+    def perform_destroy(self, instance):
+        schedule_user_deletion(instance, requested_by=self.request.user)
 
     @action(methods=['get'],
             detail=False,
             permission_classes=(permissions.IsAuthenticated,))
     def me(self, request):
-        serializer = UserSerializer(request.user)
+        serializer = UserSerializer(
+            request.user, **self.get_field_selection())
         return Response(serializer.data,
                         status=status.HTTP_200_OK)
 
@@ -56,7 +284,7 @@ class CustomUserViewSet(UserViewSet):
             permission_classes=(permissions.IsAuthenticated,))
     def subscribe(self, request, id):
         user = self.request.user
-        author = get_object_or_404(User, id=id)
+        author = get_object_or_404(User, id=id, is_active=True)
         if request.method == 'POST':
             serializer = SubscriptionsSerializer(
                 data=request.data,
@@ -80,24 +308,157 @@ class CustomUserViewSet(UserViewSet):
             detail=False,
             permission_classes=(permissions.IsAuthenticated,))
     def subscriptions(self, request):
-        queryset = User.objects.filter(following__user=request.user)
+        selection = self.get_field_selection()
+        # В списке только авторы, на которых пользователь подписан.
+        queryset = User.objects.filter(
+            following__user=request.user, is_active=True).annotate(
+            is_subscribed=Value(True, output_field=BooleanField()))
+        if is_selected('recipes_count', **selection):
+            queryset = queryset.annotate(
+                recipes_count=Count('recipes', distinct=True))
         pages = self.paginate_queryset(queryset)
+        context = {'request': request}
+        if is_selected('recipes', **selection):
+            context['recipe_cards'] = recipe_cards_by_author(
+                [author.pk for author in pages], get_recipes_limit(request))
         serializer = SubscriptionsListSerializer(
             pages,
             many=True,
-            context={'request': request})
+            context=context,
+            **selection)
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class ImageUploadViewSet(mixins.CreateModelMixin,
+                         mixins.RetrieveModelMixin,
+                         mixins.DestroyModelMixin,
+                         viewsets.GenericViewSet):
+    """Загрузка изображения частями с возможностью продолжения.
+
+    POST создаёт загрузку с объявленным размером. Каждая часть
+    отправляется PATCH-запросом с телом application/offset+octet-stream
+    и заголовком Upload-Offset, равным уже полученному числу байт;
+    GET возвращает текущее смещение для продолжения после обрыва.
+    """
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    lookup_field = 'token'
+    http_method_names = ['get', 'post', 'patch', 'delete', 'head',
+                         'options']
+
+    def get_queryset(self):
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def perform_create(self, serializer):
+        remove_expired_uploads()
+        serializer.save(user=self.request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        data = response.data
+        if isinstance(data, dict) and 'offset' in data:
+            response['Upload-Offset'] = data['offset']
+        return super().finalize_response(request, response, *args, **kwargs)
+
+    def partial_update(self, request, token=None):
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.META['CONTENT_LENGTH'])
+        except (KeyError, ValueError):
+            return Response(
+                {'errors': 'Нужны заголовки Upload-Offset '
+                           'и Content-Length.'},
+                status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.IMAGE_UPLOAD_CHUNK_SIZE:
+            return Response(
+                {'errors': 'Слишком большая часть файла.'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        with transaction.atomic():
+            upload = get_object_or_404(
+                self.get_queryset().select_for_update(), token=token)
+            if upload.is_complete or offset != upload.offset:
+                return Response(
+                    {'errors': 'Смещение не совпадает с полученным.',
+                     'offset': upload.offset},
+                    status=status.HTTP_409_CONFLICT)
+            if offset + length > upload.size:
+                return Response(
+                    {'errors': 'Часть выходит за объявленный размер.'},
+                    status=status.HTTP_400_BAD_REQUEST)
+            upload.offset += write_chunk(upload, request.stream, length)
+            if upload.offset == upload.size:
+                upload.filename = identify_image(upload) or ''
+                if not upload.filename:
+                    upload.delete()
+                    return Response(
+                        {'errors': 'Загруженный файл не является '
+                                   'изображением.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+            upload.save(update_fields=('offset', 'filename'))
+        return Response(self.get_serializer(upload).data)
+
+
+class RecipeViewSet(StatementTimeoutMixin, FieldSelectionMixin,
+                    viewsets.ModelViewSet):
     """Вьюсет для работы с рецептами."""
 
-    queryset = Recipe.objects.all()
+    queryset = Recipe.objects.visible().select_related(
+        'author').prefetch_related('tags', 'recipe_ingredient')
     pagination_class = PageNumberPagination
     permission_classes = (IsOwnerOrAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     http_method_names = ['get', 'post', 'patch', 'delete']
+    selection_params = ('fields', 'omit', 'expand')
+    throttle_scopes = {
+        'create': 'recipe_write',
+        'partial_update': 'recipe_write',
+        'download_shopping_cart': 'shopping_cart_download',
+    }
+    statement_timeouts = {
+        'list': 5000,
+        'download_shopping_cart': 10000,
+    }
+
+    def get_field_selection(self):
+        selection = super().get_field_selection()
+        if 'fields' in selection or 'expand' in selection:
+            selection.setdefault('expand', set())
+        return selection
+
+    def get_queryset(self):
+        if self.action not in self.selection_actions:
+            return super().get_queryset()
+        selection = self.get_field_selection()
+        expand = selection.pop('expand', None)
+
+        def expanded(name):
+            return is_selected(name, **selection) and (
+                expand is None or name in expand)
+
+        user = self.request.user
+        queryset = Recipe.objects.visible().only('id', 'author', *(
+            name for name in READ_COLUMNS if is_selected(name, **selection)))
+        if expanded('author'):
+            if user.is_authenticated:
+                queryset = queryset.prefetch_related(Prefetch(
+                    'author', queryset=User.objects.annotate(
+                        is_subscribed=Exists(Subscription.objects.filter(
+                            user=user, author=OuterRef('pk'))))))
+            else:
+                queryset = queryset.select_related('author')
+        if is_selected('tags', **selection):
+            queryset = queryset.prefetch_related('tags')
+        if is_selected('ingredients', **selection):
+            queryset = queryset.prefetch_related('recipe_ingredient')
+        if user.is_authenticated:
+            for name, model in (('is_favorited', Favorites),
+                                ('is_in_shopping_cart', ShoppingCart)):
+                if is_selected(name, **selection):
+                    queryset = queryset.annotate(**{name: Exists(
+                        model.objects.filter(
+                            user=user, recipe=OuterRef('pk')))})
+        return queryset
 
     def perform_create(self, serializer):
         return serializer.save(author=self.request.user)
@@ -107,76 +468,201 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    def add_recipe(self, model, pk, error, **fields):
+        recipe = get_object_or_404(
+            Recipe.objects.visible().only(
+                'id', 'name', 'image', 'cooking_time'),
+            id=pk)
+        user = self.request.user
+        with transaction.atomic():
+            if not insert_ignoring_conflicts(
+                    model, user_id=user.pk, recipe_id=recipe.pk, **fields):
+                return Response({'errors': error},
+                                status=status.HTTP_400_BAD_REQUEST)
+            # Вставка в обход save() не шлёт сигналов.
+            record(TOPICS[model], [recipe.pk], Change.UPSERT, user.pk)
+        serializer = RecipeSerializer(
+            recipe, context={'request': self.request})
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def remove_recipe(self, model, pk, message):
+        user = self.request.user
+        with transaction.atomic():
+            # Удаление в обход delete() не шлёт сигналов.
+            removed = delete_returning_recipes(model, user.pk, [pk])
+            if not removed:
+                raise NotFound
+            record(TOPICS[model], removed, Change.DELETE, user.pk)
+        return Response({'detail': message},
+                        status=status.HTTP_204_NO_CONTENT)
+
+    def add_recipes(self, model):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        cards = short_recipe_cards(
+            Recipe.objects.visible().filter(id__in=ids), self.request)
+        missing = set(ids) - {card['id'] for card in cards}
+        if missing:
+            return Response(
+                {'recipes': [f'Рецепты не найдены: '
+                             f'{", ".join(map(str, sorted(missing)))}.']},
+                status=status.HTTP_400_BAD_REQUEST)
+        user = self.request.user
+        with transaction.atomic():
+            existing = set(model.objects.filter(
+                user=user, recipe_id__in=ids).values_list(
+                'recipe_id', flat=True))
+            # bulk_create не шлёт сигналов, изменения пишутся явно.
+            model.objects.bulk_create(
+                [model(user=user, recipe_id=card['id']) for card in cards],
+                ignore_conflicts=True)
+            record(TOPICS[model], [pk for pk in ids if pk not in existing],
+                   Change.UPSERT, user.pk)
+        return Response(cards, status=status.HTTP_201_CREATED)
+
+    def remove_recipes(self, model):
+        serializer = RecipeIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        user = self.request.user
+        with transaction.atomic():
+            removed = delete_returning_recipes(
+                model, user.pk, serializer.validated_data['recipes'])
+            record(TOPICS[model], removed, Change.DELETE, user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(detail=True,
             methods=['post', 'delete'],
             permission_classes=(permissions.IsAuthenticated,))
     def favorite(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-
         if request.method == 'POST':
-            serializer = RecipeSerializer(recipe, data=request.data,
-                                          context={"request": request})
-            serializer.is_valid(raise_exception=True)
-            if not Favorites.objects.filter(user=request.user,
-                                            recipe=recipe).exists():
-                Favorites.objects.create(user=request.user, recipe=recipe)
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response({'errors': 'Рецепт уже в избранном.'},
-                            status=status.HTTP_400_BAD_REQUEST)
+            return self.add_recipe(
+                Favorites, pk, 'Рецепт уже в избранном.')
+        return self.remove_recipe(
+            Favorites, pk, 'Рецепт успешно удален из избранного.')
 
-        if request.method == 'DELETE':
-            get_object_or_404(Favorites, user=request.user,
-                              recipe=recipe).delete()
-            return Response({'detail': 'Рецепт успешно удален из избранного.'},
-                            status=status.HTTP_204_NO_CONTENT)
+    @action(detail=False,
+            methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,),
+            url_path='favorite',
+            url_name='favorite-bulk')
+    def favorite_bulk(self, request):
+        if request.method == 'POST':
+            return self.add_recipes(Favorites)
+        return self.remove_recipes(Favorites)
 
     @action(detail=True,
-            methods=['post', 'delete'],
+            methods=['post', 'patch', 'delete'],
             permission_classes=(permissions.IsAuthenticated,),
             pagination_class=None)
     def shopping_cart(self, request, pk):
-        recipe = get_object_or_404(Recipe, id=pk)
-
+        if request.method == 'DELETE':
+            return self.remove_recipe(
+                ShoppingCart, pk, 'Рецепт успешно удален из списка покупок.')
+        # Без servings количества берутся как в рецепте.
+        serializer = ServingsSerializer(
+            data=request.data, partial=request.method == 'POST')
+        serializer.is_valid(raise_exception=True)
         if request.method == 'POST':
-            serializer = RecipeSerializer(
-                recipe,
-                data=request.data,
-                context={"request": request})
-            serializer.is_valid(raise_exception=True)
+            return self.add_recipe(
+                ShoppingCart, pk, 'Рецепт уже в списке покупок.',
+                **serializer.validated_data)
+        with transaction.atomic():
             if not ShoppingCart.objects.filter(
-                    user=request.user, recipe=recipe).exists():
-                ShoppingCart.objects.create(user=request.user, recipe=recipe)
-                return Response(serializer.data,
-                                status=status.HTTP_201_CREATED)
-            return Response(
-                {'errors': 'Рецепт уже в списке покупок.'},
-                status=status.HTTP_400_BAD_REQUEST)
+                    user=request.user, recipe_id=pk).update(
+                    **serializer.validated_data):
+                raise NotFound
+            # update() не шлёт сигналов, изменение пишется явно.
+            record(TOPICS[ShoppingCart], [int(pk)], Change.UPSERT,
+                   request.user.pk)
+        return Response({'id': int(pk), **serializer.validated_data})
 
-        if request.method == 'DELETE':
-            get_object_or_404(
-                ShoppingCart, user=request.user,
-                recipe=recipe).delete()
-            return Response(
-                {'detail': 'Рецепт успешно удален из списка покупок.'},
-                status=status.HTTP_204_NO_CONTENT)
+    @action(detail=False,
+            methods=['post', 'delete'],
+            permission_classes=(permissions.IsAuthenticated,),
+            url_path='shopping_cart',
+            url_name='shopping-cart-bulk')
+    def shopping_cart_bulk(self, request):
+        if request.method == 'POST':
+            return self.add_recipes(ShoppingCart)
+        return self.remove_recipes(ShoppingCart)
 
     @action(detail=False,
             methods=['get'],
             permission_classes=(permissions.IsAuthenticated,))
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects
-            .filter(recipe__shoppingcart_recipe__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(amount=Sum('amount'))
-            .values_list('ingredient__name',
-                         'ingredient__measurement_unit', 'amount'))
         shopping_list = []
-        for name, measurement_unit, amount in ingredients:
+        for name, unit, total in cart_ingredients(request.user):
+            measurement_unit, amount = display_amount(unit, total)
             shopping_list.append(
-                f'{name} - {amount} {measurement_unit} \n'
+                f'{name} - {format_amount(amount)} {measurement_unit} \n'
             )
         response = HttpResponse(shopping_list, 'Content-Type: text/plain')
         response['Content-Disposition'] = 'attachment; filename="shoplist.txt"'
         return response
+
+
+class MealPlanViewSet(StatementTimeoutMixin, viewsets.ModelViewSet):
+    """Вьюсет для плана питания пользователя."""
+
+    serializer_class = MealPlanSerializer
+    permission_classes = (permissions.IsAuthenticated,)
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = MealPlanFilter
+    http_method_names = ['get', 'post', 'patch', 'delete']
+    statement_timeouts = {'ingredients': 10000}
+
+    def get_queryset(self):
+        return MealPlan.objects.filter(
+            user=self.request.user).select_related('recipe').only(
+            'id', 'user', 'date', 'meal', 'servings', 'recipe',
+            *(f'recipe__{name}' for name in SHORT_CARD_FIELDS))
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
+        forget_weeks([self.request.user.pk])
+
+    def perform_update(self, serializer):
+        serializer.save()
+        forget_weeks([self.request.user.pk])
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        serializer = MealPlanBulkSerializer(
+            data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        user = request.user
+        plans = [MealPlan(user=user, **fields)
+                 for fields in serializer.validated_data['plans']]
+        created = [plan for plan in plans if plan.id is None]
+        updated = [plan for plan in plans if plan.id is not None]
+        with unique_plan():
+            MealPlan.objects.filter(
+                user=user,
+                id__in=serializer.validated_data['delete']).delete()
+            MealPlan.objects.bulk_update(
+                updated, ('date', 'meal', 'recipe', 'servings'))
+            MealPlan.objects.bulk_create(created)
+            if (created and not
+                    connection.features.can_return_rows_from_bulk_insert):
+                # Без RETURNING номера новых записей читаются по их
+                # уникальному сочетанию даты, приёма пищи и рецепта.
+                rows = MealPlan.objects.filter(
+                    user=user, date__in={plan.date for plan in created},
+                ).values_list('id', 'date', 'meal', 'recipe_id')
+                ids = {(date, meal, recipe_id): pk
+                       for pk, date, meal, recipe_id in rows}
+                for plan in created:
+                    plan.id = ids[plan.date, plan.meal, plan.recipe_id]
+            forget_weeks([user.pk])
+        return Response(
+            self.get_serializer(plans, many=True).data,
+            status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def ingredients(self, request):
+        serializer = MealPlanRangeSerializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        return Response(plan_summary(
+            request.user, serializer.validated_data['start'],
+            serializer.validated_data['end']))
@@ -0,0 +1,6 @@
+"""Нагрузочные замеры эндпоинтов API.
+
+Запуск из каталога ``backend``::
+
+    python -m benchmarks --scale 2 --iterations 50 --output bench.json
+"""
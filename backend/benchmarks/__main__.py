@@ -0,0 +1,127 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks',
+        description='Замеры производительности эндпоинтов API.')
+    parser.add_argument('--scale', type=int, default=1,
+                        help='Множитель объёма тестовых данных.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--only', nargs='*', default=(),
+                        help='Запустить только перечисленные сценарии.')
+    parser.add_argument('--output', help='Файл для JSON-отчёта.')
+    parser.add_argument('--parity', action='store_true',
+                        help='Вместо замеров сравнить быстрый путь '
+                             'сериализации с сериализаторами DRF.')
+    parser.add_argument('--plans', action='store_true',
+                        help='Вместо замеров проверить бюджеты запросов '
+                             'и планы EXPLAIN на PostgreSQL.')
+    return parser.parse_args()
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', 'HEAD'), capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
+
+    import django
+    django.setup()
+
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import (override_settings, setup_test_environment,
+                                   teardown_test_environment)
+
+    from .parity import check_parity
+    from .plans import audit
+    from .runner import Runner
+    from .scenarios import SCENARIOS
+    from .seed import seed
+
+    if args.plans and connection.vendor != 'postgresql':
+        # Бюджеты запросов подобраны под PostgreSQL.
+        sys.exit('--plans работает только с PostgreSQL')
+    scenarios = [scenario for scenario in SCENARIOS
+                 if not args.only or scenario.name in args.only]
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    try:
+        # Замеры шлют сотни одинаковых запросов, ограничения частоты
+        # им бы только мешали.
+        unthrottled = {**settings.REST_FRAMEWORK,
+                       'DEFAULT_THROTTLE_RATES': {}}
+        with tempfile.TemporaryDirectory() as media_root, \
+                override_settings(MEDIA_ROOT=media_root,
+                                  REST_FRAMEWORK=unthrottled):
+            dataset = seed(scale=args.scale, seed=args.seed)
+            if args.parity:
+                mismatches = check_parity(dataset)
+                print(json.dumps(mismatches, ensure_ascii=False, indent=2))
+                sys.exit(1 if mismatches else 0)
+            if args.plans:
+                # Второй запрос ловит то, что скрыто кэшами первого,
+                # а у переключателей — обратное действие.
+                runner = Runner(dataset, iterations=2, warmup=0)
+                results = {
+                    scenario.name: audit(
+                        scenario, runner.run(scenario, runner.capture))
+                    for scenario in scenarios}
+                print(json.dumps(results, ensure_ascii=False, indent=2))
+                failed = [name for name, result in results.items()
+                          if result['violations']]
+                for name in failed:
+                    for violation in results[name]['violations']:
+                        print(f'{name}: {violation}', file=sys.stderr)
+                sys.exit(1 if failed else 0)
+            runner = Runner(dataset, args.iterations, args.warmup)
+            results = {}
+            for scenario in scenarios:
+                results[scenario.name] = runner.run(scenario)
+                print(f'{scenario.name}: '
+                      f'{results[scenario.name]["latency_ms"]["p50"]} ms',
+                      file=sys.stderr)
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+    report = {
+        'meta': {
+            'revision': git_revision(),
+            'created': datetime.now(timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'scale': args.scale,
+            'seed': args.seed,
+            'iterations': args.iterations,
+        },
+        'scenarios': results,
+    }
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
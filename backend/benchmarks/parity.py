@@ -0,0 +1,96 @@
+import datetime
+import decimal
+
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.renderers import FastJSONRenderer
+from api.serializers import (RecipeSerializer, recipe_cards_by_author,
+                             short_recipe_cards)
+from recipes.models import Recipe
+
+CHUNK_SIZE = 100
+RECIPES_LIMITS = (None, 0, 1, 3)
+
+SAMPLE_PAYLOADS = {
+    'strings': {'text': 'Строка\u2028с\u2029разделителями "и" \\ <тегами>',
+                'empty': '', 'lazy': gettext_lazy('Рецепт')},
+    'numbers': {'int': 2 ** 53, 'negative': -1, 'float': 0.1,
+                'decimal': decimal.Decimal('1.50'), 'bool': True,
+                'none': None},
+    'dates': {'datetime': datetime.datetime(2022, 1, 2, 3, 4, 5, 678901,
+                                            tzinfo=datetime.timezone.utc),
+              'date': datetime.date(2022, 1, 2),
+              'time': datetime.time(3, 4, 5, 678901)},
+    'containers': {1: ('кортеж', [{}]), 'set': {1}},
+    'big_int': [2 ** 70],
+}
+
+
+def compare(name, expected, actual):
+    if expected == actual:
+        return None
+    position = next(
+        (index for index, (first, second) in enumerate(zip(expected, actual))
+         if first != second), min(len(expected), len(actual)))
+    return {'check': name, 'position': position,
+            'expected': expected[position:position + 80].decode(
+                errors='replace'),
+            'actual': actual[position:position + 80].decode(
+                errors='replace')}
+
+
+def check_renderer():
+    mismatches = []
+    for name, payload in SAMPLE_PAYLOADS.items():
+        mismatches.append(compare(
+            f'renderer:{name}', JSONRenderer().render(payload),
+            FastJSONRenderer().render(payload)))
+    return mismatches
+
+
+def check_short_cards(request):
+    mismatches = []
+    recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        queryset = Recipe.objects.filter(
+            id__in=recipe_ids[start:start + CHUNK_SIZE])
+        for context_request in (None, request):
+            expected = JSONRenderer().render(RecipeSerializer(
+                queryset, many=True,
+                context={'request': context_request}).data)
+            actual = FastJSONRenderer().render(
+                short_recipe_cards(queryset, context_request))
+            mismatches.append(compare(
+                f'short_cards:{start}:{context_request is not None}',
+                expected, actual))
+    return mismatches
+
+
+def check_cards_by_author(dataset):
+    mismatches = []
+    for limit in RECIPES_LIMITS:
+        cards = recipe_cards_by_author(dataset.user_ids, limit)
+        for author_id in dataset.user_ids:
+            queryset = Recipe.objects.filter(author_id=author_id)
+            if limit is not None:
+                queryset = queryset[:limit]
+            expected = JSONRenderer().render(
+                RecipeSerializer(queryset, many=True).data)
+            actual = FastJSONRenderer().render(cards.get(author_id, []))
+            mismatches.append(compare(
+                f'cards_by_author:{author_id}:{limit}', expected, actual))
+    return mismatches
+
+
+def check_parity(dataset):
+    """Сравнивает быстрый путь с сериализаторами DRF побайтно.
+
+    Возвращает список расхождений; пустой список означает,
+    что ответы совпадают.
+    """
+    request = APIRequestFactory().get('/api/recipes/')
+    mismatches = (check_renderer() + check_short_cards(request)
+                  + check_cards_by_author(dataset))
+    return [mismatch for mismatch in mismatches if mismatch is not None]
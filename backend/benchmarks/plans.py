@@ -0,0 +1,88 @@
+import re
+from collections import Counter
+
+from django.db import connection, transaction
+
+from recipes.models import (Favorites, Recipe, RecipeIngredient,
+                            ReferenceVersion, ShoppingCart)
+from users.models import Subscription
+
+# Таблицы, которые растут вместе с числом пользователей и рецептов:
+# последовательное чтение любой из них — регрессия.
+LARGE_TABLES = frozenset(model._meta.db_table for model in (
+    Recipe, RecipeIngredient, Favorites, ShoppingCart, Subscription))
+EXPLAINED = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+# Столько одинаковых по форме запросов за один запрос к API — это N+1.
+REPEAT_LIMIT = 3
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+# Сверка номеров версий кэшей процесса (справочники, токены) идёт раз
+# в несколько секунд на процесс, а не на запрос, и в бюджет не входит.
+VERSION_TABLE = connection.ops.quote_name(ReferenceVersion._meta.db_table)
+
+
+def shape(sql):
+    return LITERALS.sub('?', sql)
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from plan_nodes(child)
+
+
+def explain(sql):
+    """План запроса, в котором по возможности нет Seq Scan.
+
+    На маленькой тестовой базе планировщик честно выбирает полное
+    чтение, поэтому оно запрещается: оставшиеся Seq Scan означают,
+    что подходящего индекса нет вовсе.
+    """
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('SET LOCAL enable_seqscan = off')
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+        plan = cursor.fetchone()[0]
+        transaction.set_rollback(True)
+    return plan[0]['Plan']
+
+
+def sequential_scans(plan):
+    return sorted({node['Relation Name'] for node in plan_nodes(plan)
+                   if node['Node Type'] == 'Seq Scan'
+                   and node['Relation Name'] in LARGE_TABLES})
+
+
+def audit(scenario, requests):
+    """Проверяет бюджет запросов и планы одного сценария."""
+    violations = []
+    counts = [sum(VERSION_TABLE not in query['sql'] for query in queries)
+              for queries in requests]
+    if scenario.query_budget is not None and \
+            max(counts) > scenario.query_budget:
+        violations.append(f'запросов к БД {max(counts)}, '
+                          f'бюджет {scenario.query_budget}')
+
+    statements = {}
+    for queries in requests:
+        repeated = Counter(shape(query['sql']) for query in queries
+                           if query['sql'].startswith('SELECT'))
+        for sql_shape, number in repeated.items():
+            if number >= REPEAT_LIMIT:
+                violations.append(
+                    f'N+1: {number} одинаковых запросов {sql_shape[:120]}')
+        for query in queries:
+            if query['sql'].startswith(EXPLAINED):
+                statements.setdefault(shape(query['sql']), query['sql'])
+
+    plans = []
+    for sql in statements.values():
+        scans = sequential_scans(explain(sql))
+        plans.append({'sql': sql, 'seq_scans': scans})
+        for table in set(scans) - set(scenario.seq_scans):
+            violations.append(f'Seq Scan по {table}: {sql[:120]}')
+    return {
+        'queries': counts,
+        'query_budget': scenario.query_budget,
+        'statements': len(statements),
+        'plans': plans,
+        'violations': list(dict.fromkeys(violations)),
+    }
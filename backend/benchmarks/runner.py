@@ -0,0 +1,98 @@
+import time
+from collections import Counter
+from itertools import count
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (
+        ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(latencies, queries, statuses, elapsed):
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        'requests': len(latencies),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'latency_ms': {
+            'min': round(min(latencies_ms), 3),
+            'p50': round(percentile(latencies_ms, 0.50), 3),
+            'p95': round(percentile(latencies_ms, 0.95), 3),
+            'p99': round(percentile(latencies_ms, 0.99), 3),
+            'max': round(max(latencies_ms), 3),
+        },
+        'queries': {
+            'min': min(queries),
+            'max': max(queries),
+            'mean': round(sum(queries) / len(queries), 2),
+        },
+        'status_codes': dict(Counter(map(str, statuses))),
+    }
+
+
+class Runner:
+    """Прогоняет сценарии через настоящий URLconf проекта."""
+
+    def __init__(self, dataset, iterations=100, warmup=5):
+        self.dataset = dataset
+        self.iterations = iterations
+        self.warmup = warmup
+
+    def client(self, authenticated):
+        client = APIClient()
+        if authenticated:
+            client.credentials(
+                HTTP_AUTHORIZATION=f'Token {self.dataset.tokens[0]}')
+        return client
+
+    def run(self, scenario, measure=None):
+        client = self.client(scenario.authenticated)
+        state = {}
+        if scenario.setup:
+            scenario.setup(client, self.dataset, state)
+        try:
+            return (measure or self.measure)(client, scenario, state)
+        finally:
+            if scenario.teardown:
+                scenario.teardown(client, self.dataset, state)
+
+    def capture(self, client, scenario, state):
+        """SQL-запросы первых запросов сценария, по одному списку на запрос."""
+        requests = []
+        for number in range(self.iterations):
+            with CaptureQueriesContext(connection) as captured:
+                self.request(client, scenario, state, number)
+            requests.append(captured.captured_queries)
+        return requests
+
+    def measure(self, client, scenario, state):
+        numbers = count()
+        for _ in range(self.warmup):
+            self.request(client, scenario, state, next(numbers))
+
+        latencies, queries, statuses = [], [], []
+        started = time.perf_counter()
+        for _ in range(self.iterations):
+            with CaptureQueriesContext(connection) as captured:
+                request_started = time.perf_counter()
+                response = self.request(
+                    client, scenario, state, next(numbers))
+                latencies.append(time.perf_counter() - request_started)
+            queries.append(len(captured))
+            statuses.append(response.status_code)
+        elapsed = time.perf_counter() - started
+        return summarize(latencies, queries, statuses, elapsed)
+
+    def request(self, client, scenario, state, number):
+        method, path, payload = scenario.build(self.dataset, state, number)
+        response = getattr(client, method)(path, payload, format='json')
+        # Принудительно читаем тело, чтобы учесть потоковые ответы.
+        b''.join(response) if response.streaming else response.content
+        return response
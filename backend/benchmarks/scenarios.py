@@ -0,0 +1,244 @@
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from api.views import RecipeViewSet
+from recipes.models import MealPlan, Recipe, RecipeIngredient, ShoppingCart
+from recipes.planning import current_week
+
+# Прозрачный PNG 1x1 для сценариев создания и изменения рецептов.
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg==')
+RECIPE_INGREDIENTS = 30
+BULK_RECIPES = 20
+LARGE_CART = 500
+PLAN_WEEKS = 4
+
+
+@dataclass
+class Scenario:
+    """Сценарий нагрузки: как построить i-й запрос к API.
+
+    query_budget — допустимое число запросов к БД на один запрос к API,
+    seq_scans — большие таблицы, полное чтение которых здесь ожидаемо.
+    """
+
+    name: str
+    build: Callable
+    authenticated: bool = False
+    setup: Optional[Callable] = None
+    teardown: Optional[Callable] = None
+    query_budget: Optional[int] = None
+    seq_scans: tuple = ()
+
+
+def get(path):
+    return lambda dataset, state, i: ('get', path, None)
+
+
+def recipe_payload(dataset, i, offset=0):
+    ingredients = dataset.ingredient_ids[
+        offset:offset + RECIPE_INGREDIENTS]
+    return {
+        'ingredients': [{'id': ingredient_id, 'amount': 10}
+                        for ingredient_id in ingredients],
+        'tags': dataset.tag_ids[:2],
+        'image': IMAGE,
+        'name': f'Замер {i}',
+        'text': f'Рецепт, созданный замером, номер {offset}-{i}.',
+        'cooking_time': 15,
+    }
+
+
+def recipe_detail(dataset, state, i):
+    recipe_id = dataset.recipe_ids[i % len(dataset.recipe_ids)]
+    return 'get', f'/api/recipes/{recipe_id}/', None
+
+
+def recipes_by_tags(dataset, state, i):
+    query = '&'.join(f'tags={slug}' for slug in dataset.tag_slugs[:2])
+    return 'get', f'/api/recipes/?{query}', None
+
+
+def ingredient_search(dataset, state, i):
+    prefixes = ('а', 'мо', 'сах', 'кар', 'я')
+    return 'get', f'/api/ingredients/?name={prefixes[i % 5]}', None
+
+
+def toggle(action):
+    def build(dataset, state, i):
+        recipe_id = dataset.recipe_ids[-1]
+        method = 'post' if i % 2 == 0 else 'delete'
+        return method, f'/api/recipes/{recipe_id}/{action}/', None
+    return build
+
+
+def toggle_bulk(dataset, state, i):
+    method = 'post' if i % 2 == 0 else 'delete'
+    return (method, '/api/recipes/shopping_cart/',
+            {'recipes': dataset.recipe_ids[:BULK_RECIPES]})
+
+
+def create_recipe(dataset, state, i):
+    return 'post', '/api/recipes/', recipe_payload(dataset, i)
+
+
+def setup_update(client, dataset, state):
+    response = client.post('/api/recipes/',
+                           recipe_payload(dataset, 0, offset=100),
+                           format='json')
+    state['recipe_id'] = response.json()['id']
+
+
+def update_recipe(dataset, state, i):
+    payload = recipe_payload(dataset, i, offset=200 + i % 2)
+    return 'patch', f'/api/recipes/{state["recipe_id"]}/', payload
+
+
+def use_plain_token_auth(client, dataset, state):
+    state['authentication_classes'] = RecipeViewSet.authentication_classes
+    RecipeViewSet.authentication_classes = (TokenAuthentication,)
+
+
+def restore_auth(client, dataset, state):
+    RecipeViewSet.authentication_classes = state['authentication_classes']
+
+
+def add_cart_recipes(dataset, number):
+    """Дополнительные рецепты с ингредиентами уже созданных."""
+    recipes = []
+    for i in range(number):
+        recipe = Recipe(author_id=dataset.user_ids[0],
+                        name=f'Для корзины {i}',
+                        image='recipes/benchmark.png',
+                        text=f'Рецепт для большой корзины номер {i}.',
+                        cooking_time=10, servings=4)
+        recipe.update_fingerprints()
+        recipes.append(recipe)
+    if not recipes:
+        return []
+    Recipe.objects.bulk_create(recipes)
+    extra_ids = list(Recipe.objects.filter(
+        name__startswith='Для корзины').values_list('id', flat=True))
+    ingredients = defaultdict(list)
+    for recipe_id, ingredient_id, amount in RecipeIngredient.objects.filter(
+            recipe_id__in=dataset.recipe_ids).values_list(
+            'recipe_id', 'ingredient_id', 'amount'):
+        ingredients[recipe_id].append((ingredient_id, amount))
+    sources = dataset.recipe_ids
+    RecipeIngredient.objects.bulk_create(
+        RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                         amount=amount)
+        for i, recipe_id in enumerate(extra_ids)
+        for ingredient_id, amount in ingredients[sources[i % len(sources)]])
+    return extra_ids
+
+
+def fill_large_cart(client, dataset, state):
+    """Список покупок из LARGE_CART рецептов с разным числом порций."""
+    user_id = Token.objects.get(key=dataset.tokens[0]).user_id
+    cart = ShoppingCart.objects.filter(user_id=user_id)
+    state['cart'] = list(cart.values_list('recipe_id', 'servings'))
+    state['extra_ids'] = add_cart_recipes(
+        dataset, max(LARGE_CART - len(dataset.recipe_ids), 0))
+    cart.delete()
+    recipe_ids = (dataset.recipe_ids + state['extra_ids'])[:LARGE_CART]
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user_id=user_id, recipe_id=recipe_id,
+                     servings=i % 4 or None)
+        for i, recipe_id in enumerate(recipe_ids))
+    state['user_id'] = user_id
+
+
+def restore_cart(client, dataset, state):
+    ShoppingCart.objects.filter(user_id=state['user_id']).delete()
+    Recipe.objects.filter(id__in=state['extra_ids']).delete()
+    ShoppingCart.objects.bulk_create(
+        ShoppingCart(user_id=state['user_id'], recipe_id=recipe_id,
+                     servings=servings)
+        for recipe_id, servings in state['cart'])
+
+
+def fill_meal_plan(client, dataset, state):
+    """План на PLAN_WEEKS недель начиная с текущей: по рецепту на каждый
+    приём пищи каждого дня."""
+    user_id = Token.objects.get(key=dataset.tokens[0]).user_id
+    start, _ = current_week()
+    recipe_ids = dataset.recipe_ids
+    meals = [meal for meal, _ in MealPlan.MEALS]
+    MealPlan.objects.bulk_create(
+        MealPlan(user_id=user_id,
+                 date=start + datetime.timedelta(days=day),
+                 meal=meal,
+                 recipe_id=recipe_ids[(day * len(meals) + i)
+                                      % len(recipe_ids)],
+                 servings=(day + i) % 3 or None)
+        for day in range(PLAN_WEEKS * 7)
+        for i, meal in enumerate(meals))
+    state['user_id'] = user_id
+
+
+def meal_plan_ingredients(dataset, state, i):
+    start, _ = current_week()
+    end = start + datetime.timedelta(days=PLAN_WEEKS * 7 - 1)
+    return 'get', f'/api/meal_plans/ingredients/?start={start}&end={end}', None
+
+
+def clear_meal_plan(client, dataset, state):
+    MealPlan.objects.filter(user_id=state['user_id']).delete()
+
+
+# Чтение списков идёт в транзакции с SET LOCAL statement_timeout,
+# это один лишний запрос к БД.
+SCENARIOS = (
+    Scenario('recipe_list_anonymous', get('/api/recipes/'), query_budget=7),
+    Scenario('recipe_list_authenticated', get('/api/recipes/'),
+             authenticated=True, query_budget=7),
+    Scenario('recipe_list_cards', get(
+        '/api/recipes/?fields=id,name,image,cooking_time'),
+        authenticated=True, query_budget=3),
+    # Для сравнения с кэширующей аутентификацией по умолчанию.
+    Scenario('recipe_list_plain_token_auth', get('/api/recipes/'),
+             authenticated=True, setup=use_plain_token_auth,
+             teardown=restore_auth, query_budget=7),
+    Scenario('recipe_list_tags_anonymous', recipes_by_tags, query_budget=7),
+    Scenario('recipe_list_tags_authenticated', recipes_by_tags,
+             authenticated=True, query_budget=6),
+    Scenario('recipe_detail', recipe_detail, authenticated=True,
+             query_budget=4),
+    Scenario('ingredient_autocomplete', ingredient_search, query_budget=1),
+    Scenario('user_list', get('/api/users/'), authenticated=True,
+             query_budget=4),
+    Scenario('user_search', get('/api/users/?search=bench%201'),
+             authenticated=True, query_budget=3),
+    Scenario('subscriptions', get(
+        '/api/users/subscriptions/?recipes_limit=3'), authenticated=True,
+        query_budget=4),
+    # В бюджете переключений есть чтение позиций ленты после коммита
+    # для событий в реальном времени.
+    Scenario('favorite_toggle', toggle('favorite'), authenticated=True,
+             query_budget=5),
+    Scenario('shopping_cart_toggle', toggle('shopping_cart'),
+             authenticated=True, query_budget=5),
+    Scenario('shopping_cart_bulk_toggle', toggle_bulk, authenticated=True,
+             query_budget=6),
+    Scenario('recipe_create', create_recipe, authenticated=True,
+             query_budget=14),
+    Scenario('recipe_update', update_recipe, authenticated=True,
+             setup=setup_update, query_budget=18),
+    Scenario('download_shopping_cart', get(
+        '/api/recipes/download_shopping_cart/'), authenticated=True,
+        query_budget=2),
+    # Число запросов не зависит от размера списка покупок.
+    Scenario('download_shopping_cart_large', get(
+        '/api/recipes/download_shopping_cart/'), authenticated=True,
+        setup=fill_large_cart, teardown=restore_cart, query_budget=2),
+    # Сводка за месяц — один GROUP BY, как и список покупок.
+    Scenario('meal_plan_ingredients', meal_plan_ingredients,
+             authenticated=True, setup=fill_meal_plan,
+             teardown=clear_meal_plan, query_budget=2),
+)
@@ -0,0 +1,123 @@
+import csv
+import random
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from recipes import registry
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from users.models import Subscription, User
+
+BASE_USERS = 50
+BASE_RECIPES = 200
+INGREDIENTS_PER_RECIPE = 8
+FAVORITES_PER_USER = 20
+CART_PER_USER = 10
+SUBSCRIPTIONS_PER_USER = 10
+BATCH_SIZE = 1000
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#008000', 'lunch'),
+    ('Ужин', '#8B00FF', 'dinner'),
+)
+
+
+@dataclass
+class Dataset:
+    """Идентификаторы объектов, на которые ссылаются сценарии."""
+
+    tokens: list = field(default_factory=list)
+    user_ids: list = field(default_factory=list)
+    recipe_ids: list = field(default_factory=list)
+    ingredient_ids: list = field(default_factory=list)
+    tag_ids: list = field(default_factory=list)
+    tag_slugs: list = field(default_factory=list)
+
+
+def load_ingredients():
+    if Ingredient.objects.exists():
+        return
+    csv_file_path = f'{settings.BASE_DIR}/data/ingredients.csv'
+    with open(csv_file_path, 'r', encoding='utf-8') as csv_file:
+        Ingredient.objects.bulk_create(
+            (Ingredient(name=row['name'],
+                        measurement_unit=row['measurement_unit'])
+             for row in csv.DictReader(csv_file)),
+            batch_size=BATCH_SIZE)
+    registry.ingredients.bump()
+
+
+def seed(scale=1, seed=0):
+    """Наполняет пустую базу детерминированным набором данных."""
+    rng = random.Random(seed)
+    dataset = Dataset()
+
+    for name, color, slug in TAGS:
+        Tag.objects.get_or_create(name=name, color=color, slug=slug)
+    load_ingredients()
+    dataset.tag_ids = list(Tag.objects.values_list('id', flat=True))
+    dataset.tag_slugs = list(Tag.objects.values_list('slug', flat=True))
+    dataset.ingredient_ids = list(
+        Ingredient.objects.values_list('id', flat=True))
+
+    password = make_password('benchmark')
+    User.objects.bulk_create(
+        (User(email=f'bench{i}@example.com', username=f'bench{i}',
+              first_name='Bench', last_name=str(i), password=password)
+         for i in range(BASE_USERS * scale)),
+        batch_size=BATCH_SIZE)
+    dataset.user_ids = list(User.objects.filter(
+        username__startswith='bench').values_list('id', flat=True))
+    Token.objects.bulk_create(
+        (Token(key=Token.generate_key(), user_id=user_id)
+         for user_id in dataset.user_ids),
+        batch_size=BATCH_SIZE)
+    dataset.tokens = list(Token.objects.filter(
+        user_id__in=dataset.user_ids).values_list('key', flat=True))
+
+    recipes = []
+    for i in range(BASE_RECIPES * scale):
+        recipe = Recipe(author_id=rng.choice(dataset.user_ids),
+                        name=f'Рецепт {i}',
+                        image='recipes/benchmark.png',
+                        text=f'Описание рецепта номер {i}.',
+                        cooking_time=rng.randint(5, 120))
+        recipe.update_fingerprints()
+        recipes.append(recipe)
+    Recipe.objects.bulk_create(recipes, batch_size=BATCH_SIZE)
+    dataset.recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+
+    RecipeTag = Recipe.tags.through
+    RecipeTag.objects.bulk_create(
+        (RecipeTag(recipe_id=recipe_id, tag_id=tag_id)
+         for recipe_id in dataset.recipe_ids
+         for tag_id in rng.sample(dataset.tag_ids, rng.randint(1, 2))),
+        batch_size=BATCH_SIZE)
+    RecipeIngredient.objects.bulk_create(
+        (RecipeIngredient(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                          amount=rng.randint(1, 500))
+         for recipe_id in dataset.recipe_ids
+         for ingredient_id in rng.sample(dataset.ingredient_ids,
+                                         INGREDIENTS_PER_RECIPE)),
+        batch_size=BATCH_SIZE)
+
+    for model, per_user in ((Favorites, FAVORITES_PER_USER),
+                            (ShoppingCart, CART_PER_USER)):
+        model.objects.bulk_create(
+            (model(user_id=user_id, recipe_id=recipe_id)
+             for user_id in dataset.user_ids
+             for recipe_id in rng.sample(dataset.recipe_ids, per_user)),
+            batch_size=BATCH_SIZE)
+    Subscription.objects.bulk_create(
+        (Subscription(user_id=user_id, author_id=author_id)
+         for user_id in dataset.user_ids
+         for author_id in [
+             author_id for author_id in rng.sample(
+                 dataset.user_ids, SUBSCRIPTIONS_PER_USER + 1)
+             if author_id != user_id][:SUBSCRIPTIONS_PER_USER]),
+        batch_size=BATCH_SIZE)
+    return dataset
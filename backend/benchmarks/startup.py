@@ -0,0 +1,144 @@
+"""Время от запуска воркера gunicorn до первого байта ответа.
+
+Запуск из каталога ``backend`` с настройками рабочей БД::
+
+    python -m benchmarks.startup --repeat 5 --output startup.json
+
+Для каждого режима (без preload, с preload, с preload и прогревом)
+сервер с одним воркером поднимается заново; измеряется время до первого
+байта после запуска, после перезапуска убитого воркера и обычный ответ
+прогретого воркера.
+"""
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+MODES = {
+    'plain': {'GUNICORN_PRELOAD': '0', 'GUNICORN_WARMUP': '0'},
+    'preload': {'GUNICORN_PRELOAD': '1', 'GUNICORN_WARMUP': '0'},
+    'preload_warmup': {'GUNICORN_PRELOAD': '1', 'GUNICORN_WARMUP': '1'},
+}
+STEADY_REQUESTS = 20
+START_TIMEOUT = 60
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.startup',
+        description='Холодный старт воркеров gunicorn.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--path', default='/api/recipes/',
+                        help='Запрос, до первого байта которого идёт отсчёт.')
+    parser.add_argument('--host', default='localhost',
+                        help='Заголовок Host, разрешённый в ALLOWED_HOSTS.')
+    parser.add_argument('--only', nargs='*', default=(), choices=MODES)
+    parser.add_argument('--output', help='Файл для JSON-отчёта.')
+    return parser.parse_args()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_listening(port):
+    deadline = time.monotonic() + START_TIMEOUT
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.005)
+
+
+def first_byte(port, path, host):
+    """Время до первого байта ответа в мс."""
+    connection = http.client.HTTPConnection(
+        '127.0.0.1', port, timeout=START_TIMEOUT)
+    started = time.perf_counter()
+    connection.request('GET', path, headers={'Host': host})
+    response = connection.getresponse()
+    elapsed = time.perf_counter() - started
+    response.read()
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f'{path}: HTTP {response.status}')
+    return elapsed * 1000
+
+
+def worker_pids(master):
+    children = Path(f'/proc/{master.pid}/task/{master.pid}/children')
+    return [int(pid) for pid in children.read_text().split()]
+
+
+def wait_exited(pid):
+    deadline = time.monotonic() + START_TIMEOUT
+    while Path(f'/proc/{pid}').exists() and time.monotonic() < deadline:
+        time.sleep(0.001)
+
+
+def measure(mode, args):
+    port = free_port()
+    env = {**os.environ, **MODES[mode]}
+    started = time.perf_counter()
+    master = subprocess.Popen(
+        ('gunicorn', '--config', 'gunicorn.conf.py', '--workers', '1',
+         '--bind', f'127.0.0.1:{port}', 'foodgram.wsgi'),
+        cwd=BACKEND_DIR, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_listening(port)
+        first_request = first_byte(port, args.path, args.host)
+        boot = (time.perf_counter() - started) * 1000
+        steady = statistics.median(
+            first_byte(port, args.path, args.host)
+            for _ in range(STEADY_REQUESTS))
+        # Перезапущенный воркер: форк от мастера и первый запрос.
+        (worker,) = worker_pids(master)
+        os.kill(worker, signal.SIGKILL)
+        wait_exited(worker)
+        started = time.perf_counter()
+        first_byte(port, args.path, args.host)
+        respawn = (time.perf_counter() - started) * 1000
+    finally:
+        master.terminate()
+        master.wait()
+    return {'boot_to_first_byte_ms': boot,
+            'first_request_ms': first_request,
+            'respawn_to_first_byte_ms': respawn,
+            'steady_ms': steady}
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for mode in args.only or MODES:
+        runs = [measure(mode, args) for _ in range(args.repeat)]
+        results[mode] = {
+            metric: round(statistics.median(run[metric] for run in runs), 3)
+            for metric in runs[0]}
+        print(f'{mode}: {results[mode]}', file=sys.stderr)
+    output = json.dumps(
+        {'meta': {'path': args.path, 'repeat': args.repeat},
+         'modes': results}, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
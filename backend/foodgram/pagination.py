@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from rest_framework.pagination import PageNumberPagination
+
+
+def estimated_count(queryset):
+    """Число строк таблицы по статистике PostgreSQL или None."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [connection.ops.quote_name(queryset.model._meta.db_table)])
+        row = cursor.fetchone()
+    return row[0] if row else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, не считающий COUNT(*) по всей большой таблице.
+
+    Для запроса без условий число строк берётся из статистики
+    планировщика; если таблица небольшая или запрос отфильтрован,
+    считается точно. Последняя страница по оценке может оказаться
+    пустой или не последней.
+    """
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is not None and not query.where and not query.distinct:
+            estimate = estimated_count(self.object_list)
+            if estimate is not None and \
+                    estimate >= settings.ESTIMATED_COUNT_THRESHOLD:
+                return estimate
+        return super().count
+
+
+class EstimatedCountPagination(PageNumberPagination):
+    """Постраничный вывод API с оценкой числа строк большой таблицы."""
+
+    django_paginator_class = EstimatedCountPaginator
@@ -33,12 +33,15 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.shedding.LoadSheddingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # После AuthenticationMiddleware: нужен вошедший пользователь.
+    'api.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'foodgram.urls'
@@ -69,10 +72,19 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER', 'foodgram'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        # Постоянное соединение воркера открывается при прогреве
+        # и переживает запросы.
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', 60)),
     }
 }
 
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+    }
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -106,6 +118,12 @@ STATIC_ROOT = BASE_DIR / 'collected_static'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
+# Файлы моложе этого срока сборщик не трогает: на них может
+# ссылаться ещё не зафиксированная транзакция.
+MEDIA_GC_GRACE_PERIOD = 60 * 60
+
+CATALOGUE_SNAPSHOT_ROOT = env.str('CATALOGUE_SNAPSHOT_ROOT', default=None)
+CATALOGUE_SNAPSHOT_URL = env.str('CATALOGUE_SNAPSHOT_URL', default='/catalogue/')
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -117,12 +135,80 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.ScopedThrottle',
+    ],
+    'DEFAULT_THROTTLE_RATES': {
+        'recipe_write': env.str('THROTTLE_RECIPE_WRITE', default='30/min'),
+        'shopping_cart_download': env.str('THROTTLE_SHOPPING_CART_DOWNLOAD', default='10/min'),
+        'subscriptions': env.str('THROTTLE_SUBSCRIPTIONS', default='60/min'),
+    },
 }
 
+THROTTLE_MAX_BUCKETS = 100000
+# Алиас общего кэша, например Redis, для счётчиков на все процессы.
+THROTTLE_CACHE_ALIAS = env.str('THROTTLE_CACHE_ALIAS', default=None)
+
+# Запрос, прождавший воркера дольше стольких секунд, получает 503.
+LOAD_SHEDDING_QUEUE_TIME = env.float('LOAD_SHEDDING_QUEUE_TIME', default=5.0)
+LOAD_SHEDDING_RETRY_AFTER = 5
+LOAD_SHEDDING_EXEMPT_PATHS = ('/admin/',)
+
+# Предел числа рецептов автора в списке подписок.
+RECIPES_LIMIT_MAX = 50
+
+REFERENCE_CACHE_CHECK_INTERVAL = 5
+
+# С этого числа строк админка и список пользователей API показывают
+# оценку вместо COUNT(*).
+ESTIMATED_COUNT_THRESHOLD = 100000
+
+RECIPE_NEAR_DUPLICATE_DISTANCE = env.int('RECIPE_NEAR_DUPLICATE_DISTANCE', default=None)
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = env.int('AUTH_TOKEN_CACHE_TTL', default=30)
+# Как часто процесс сверяет номер версии токенов: отзыв токена или
+# блокировка пользователя доходят до всех воркеров за это время.
+AUTH_TOKEN_CACHE_CHECK_INTERVAL = 5
+AUTH_TOKEN_CACHE_ALIAS = env.str('AUTH_TOKEN_CACHE_ALIAS', default=None)
+
+# Алиас общего кэша для сводки плана питания на текущую неделю;
+# без него сводка считается на каждый запрос.
+MEAL_PLAN_CACHE_ALIAS = env.str('MEAL_PLAN_CACHE_ALIAS', default=None)
+MEAL_PLAN_CACHE_TTL = 15 * 60
+
+IMAGE_UPLOAD_ROOT = env.str('IMAGE_UPLOAD_ROOT', default=str(BASE_DIR / 'uploads'))
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+IMAGE_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+IMAGE_UPLOAD_MAX_ACTIVE = 10
+IMAGE_UPLOAD_TTL = 24 * 60 * 60
+
+CHANGES_PAGE_SIZE = 500
+CHANGES_RETENTION_DAYS = env.int('CHANGES_RETENTION_DAYS', default=7)
+
+EVENTS_PATH = '/api/events/'
+# По умолчанию LISTEN/NOTIFY на PostgreSQL и доставка в пределах
+# процесса на остальных СУБД.
+EVENTS_BACKEND = env.str('EVENTS_BACKEND', default=None)
+EVENTS_KEEPALIVE = 15
+EVENTS_RETRY = 5
+EVENTS_QUEUE_SIZE = 100
+EVENTS_TICKET_MAX_AGE = 60
+
+REQUEST_PROFILING_ENABLED = env.bool('REQUEST_PROFILING_ENABLED', default=False)
+REQUEST_PROFILING_ROOT = env.str('REQUEST_PROFILING_ROOT', default=str(BASE_DIR / 'profiles'))
+REQUEST_PROFILING_MAX_ENTRIES = env.int('REQUEST_PROFILING_MAX_ENTRIES', default=200)
+REQUEST_PROFILING_SAMPLE_INTERVAL = 0.001
+REQUEST_PROFILING_TOKEN_MAX_AGE = 60 * 60
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'HIDE_USERS': False,
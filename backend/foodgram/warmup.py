@@ -0,0 +1,91 @@
+import inspect
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import get_resolver
+from django.utils import translation
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# Только чтение и только публичные данные.
+WARMUP_PATHS = ('/api/recipes/', '/api/tags/', '/api/ingredients/?name=а')
+
+
+def build_serializers():
+    """Строит поля всех сериализаторов API.
+
+    При этом импортируются поля и валидаторы DRF и заполняются кэши
+    _meta моделей, которые иначе заполнил бы первый запрос.
+    """
+    from api import serializers as api_serializers
+
+    built = 0
+    for _, serializer_class in inspect.getmembers(
+            api_serializers, inspect.isclass):
+        if (serializer_class.__module__ != api_serializers.__name__
+                or not issubclass(serializer_class, serializers.Serializer)):
+            continue
+        if issubclass(serializer_class, serializers.ModelSerializer) and \
+                not hasattr(serializer_class.Meta, 'model'):
+            # Базовый класс без модели.
+            continue
+        serializer_class(context={'request': None}).fields
+        built += 1
+    return built
+
+
+def allowed_host():
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def send_requests():
+    """Проводит запросы через весь стек: middleware, DRF, фильтры."""
+    handler = WSGIHandler()
+    factory = RequestFactory(HTTP_HOST=allowed_host())
+    for path in WARMUP_PATHS:
+        response = handler(factory.get(path).environ,
+                           lambda status, headers: None)
+        b''.join(response)
+        response.close()
+
+
+def warm_up():
+    """Делает работу первого запроса заранее, до приёма трафика.
+
+    При preload_app вызывается в мастере gunicorn до форка, и воркеры
+    получают готовое состояние через copy-on-write. Соединения с БД
+    после прогрева закрываются: делить их между процессами нельзя.
+    """
+    from api.renderers import FastJSONRenderer
+    from recipes import registry
+
+    started = time.perf_counter()
+    for model in apps.get_models():
+        model._meta.get_fields()
+    resolver = get_resolver()
+    resolver.reverse_dict, resolver.namespace_dict
+    translation.activate(settings.LANGUAGE_CODE)
+    translation.gettext('Not found.')
+    built = build_serializers()
+    FastJSONRenderer().render({'warmup': True})
+    for reference in (registry.tags, registry.ingredients):
+        reference.all()
+    send_requests()
+    connections.close_all()
+    logger.info('Прогрев занял %.0f мс, сериализаторов: %d',
+                (time.perf_counter() - started) * 1000, built)
+
+
+def connect():
+    """Открывает соединения воркера с БД до первого запроса."""
+    for connection in connections.all():
+        connection.ensure_connection()
@@ -0,0 +1,52 @@
+"""Настройки gunicorn: ``gunicorn -c gunicorn.conf.py foodgram.wsgi``.
+
+Приложение загружается и прогревается в мастере один раз, а воркеры
+получают его готовым через fork, поэтому новый или перезапущенный
+воркер сразу отвечает быстро.
+"""
+import gc
+import multiprocessing
+import os
+
+
+def env_flag(name, default=True):
+    return os.getenv(name, str(int(default))).lower() in ('1', 'true', 'yes')
+
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv(
+    'WEB_CONCURRENCY', min(2 * multiprocessing.cpu_count() + 1, 8)))
+preload_app = env_flag('GUNICORN_PRELOAD')
+warmup = env_flag('GUNICORN_WARMUP')
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+timeout = 30
+graceful_timeout = 30
+
+
+def when_ready(server):
+    if not (preload_app and warmup):
+        return
+    from foodgram.warmup import warm_up
+
+    try:
+        warm_up()
+    except Exception:
+        # Без прогрева сервер работает, просто медленнее стартует.
+        server.log.exception('Прогрев не удался')
+    # Объекты прогретого мастера уходят из-под сборщика мусора:
+    # иначе его обход в воркерах трогал бы их и копировал страницы.
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    if not warmup:
+        return
+    from foodgram.warmup import connect, warm_up
+
+    try:
+        if not preload_app:
+            warm_up()
+        connect()
+    except Exception:
+        worker.log.exception('Прогрев не удался')
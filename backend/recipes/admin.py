@@ -1,15 +1,32 @@
 from django import forms
 from django.contrib import admin
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.forms import ValidationError, BaseInlineFormSet
 
-from .models import (Favorites, Ingredient, Recipe, RecipeIngredient,
-                     ShoppingCart, Tag)
+from foodgram.pagination import EstimatedCountPaginator
+from .models import (Favorites, Ingredient, IngredientNutrition, MealPlan,
+                     Recipe, RecipeIngredient, ShoppingCart, Tag)
+from .nutrition import NUTRIENTS, recompute_nutrition
+from .planning import forget_recipes, forget_weeks
 
 
 class BaseAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class LargeTableAdmin(BaseAdmin):
+    """Админка таблицы с миллионами строк.
+
+    Нет точных COUNT(*) по всей таблице, внешние ключи выбираются
+    через автодополнение, а поиск идёт по префиксу с учётом регистра,
+    чтобы использовать индексы.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
 class RecipeForm(forms.ModelForm):
     class Meta:
         model = Recipe
@@ -19,7 +36,8 @@ class RecipeForm(forms.ModelForm):
         text = self.cleaned_data.get('text')
         if self.instance and self.instance.text == text:
             return text
-        if Recipe.objects.filter(text=text).exists():
+        if Recipe.objects.exclude(pk=self.instance.pk).same_text(
+                text).exists():
             raise ValidationError(
                 'Такой рецепт уже существует. Измените описание.')
         return text
@@ -41,8 +59,14 @@ class IngredientInlineFormSet(BaseInlineFormSet):
 class IngredientInline(admin.TabularInline):
 
     model = RecipeIngredient
-    extra = 3
+    extra = 1
     formset = IngredientInlineFormSet
+    autocomplete_fields = ('ingredient',)
+
+    def get_queryset(self, request):
+        # Строка инлайна подписана __str__, который читает обе связи.
+        return super().get_queryset(request).select_related(
+            'recipe', 'ingredient')
 
 
 @admin.register(Tag)
@@ -53,45 +77,105 @@ class TagAdmin(BaseAdmin):
     empty_value_display = '-пусто-'
 
 
+class NutritionInline(admin.StackedInline):
+    model = IngredientNutrition
+
+
 @admin.register(Ingredient)
 class IngredientAdmin(BaseAdmin):
     list_display = ('pk', 'name', 'measurement_unit')
-    list_filter = ('name',)
+    list_filter = ('measurement_unit',)
     search_fields = ('name',)
+    inlines = (NutritionInline,)
     empty_value_display = '-пусто-'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if change:
+            recipes = Recipe.objects.filter(
+                recipe_ingredient__ingredient=form.instance)
+            recompute_nutrition(recipes)
+            forget_recipes(recipes)
+
 
 @admin.register(Recipe)
-class RecipeAdmin(BaseAdmin):
+class RecipeAdmin(LargeTableAdmin):
     list_display = ('pk', 'name', 'author', 'in_favorites')
-    list_editable = ('name', 'author')
-    list_filter = ('name', 'author__username', 'tags__name')
-    search_fields = ('name', 'author__username', 'tags__name')
+    # Виджет автодополнения в каждой строке списка — отдельный запрос,
+    # поэтому внешние ключи меняются только на странице объекта.
+    list_editable = ('name',)
+    list_filter = ('tags',)
+    list_select_related = ('author',)
+    search_fields = ('name__startswith', 'author__username__startswith')
+    autocomplete_fields = ('author',)
+    readonly_fields = NUTRIENTS
     inlines = (IngredientInline,)
     form = RecipeForm
     empty_value_display = '-пусто-'
 
+    def get_queryset(self, request):
+        # Подзапрос считается только для строк текущей страницы,
+        # в отличие от GROUP BY по всей таблице.
+        favorites = Favorites.objects.filter(
+            recipe=OuterRef('pk')).order_by().values('recipe').annotate(
+            count=Count('*')).values('count')
+        return super().get_queryset(request).annotate(
+            favorites_count=Coalesce(
+                Subquery(favorites, output_field=IntegerField()), 0))
+
+    @admin.display(description='В избранном')
     def in_favorites(self, obj):
-        return obj.shoppingcart_recipe.count()
+        return obj.favorites_count
 
-    in_favorites.short_description = 'В избранном'
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        recompute_nutrition(Recipe.objects.filter(pk=form.instance.pk))
+        forget_recipes([form.instance.pk])
 
 
 @admin.register(RecipeIngredient)
-class RecipeIngredientAdmin(BaseAdmin):
+class RecipeIngredientAdmin(LargeTableAdmin):
     list_display = ('pk', 'recipe', 'ingredient', 'amount')
-    list_editable = ('recipe', 'ingredient', 'amount')
+    list_editable = ('amount',)
+    list_select_related = ('recipe', 'ingredient')
+    autocomplete_fields = ('recipe', 'ingredient')
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        recompute_nutrition(Recipe.objects.filter(pk=obj.recipe_id))
+        forget_recipes([obj.recipe_id])
 
-@admin.register(Favorites)
-class FavoriteAdmin(BaseAdmin):
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        recompute_nutrition(Recipe.objects.filter(pk=obj.recipe_id))
+        forget_recipes([obj.recipe_id])
+
+
+class UserListAdmin(LargeTableAdmin):
     list_display = ('pk', 'user', 'recipe')
-    list_editable = ('user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username__startswith', 'recipe__name__startswith')
+    autocomplete_fields = ('user', 'recipe')
+
+
+@admin.register(Favorites)
+class FavoriteAdmin(UserListAdmin):
+    pass
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(BaseAdmin):
-    list_display = ('pk', 'user', 'recipe')
-    list_editable = ('user', 'recipe')
-    search_fields = ('user__username', 'recipe__name')
+class ShoppingCartAdmin(UserListAdmin):
+    list_display = ('pk', 'user', 'recipe', 'servings')
+
+
+@admin.register(MealPlan)
+class MealPlanAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'date', 'meal', 'recipe', 'servings')
+    list_filter = ('meal',)
+    list_select_related = ('user', 'recipe')
+    search_fields = ('user__username__startswith', 'recipe__name__startswith')
+    autocomplete_fields = ('user', 'recipe')
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        forget_weeks([obj.user_id])
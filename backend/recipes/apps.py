@@ -1,6 +1,24 @@
 from django.apps import AppConfig
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
 
 
 class RecipesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'recipes'
+
+    def ready(self):
+        from . import registry
+        from .models import MealPlan, Recipe
+        from .planning import forget_deleted_plan
+        from .storage import (release_deleted_image, release_replaced_image,
+                              remember_image)
+
+        post_init.connect(remember_image, sender=Recipe)
+        post_save.connect(release_replaced_image, sender=Recipe)
+        post_delete.connect(release_deleted_image, sender=Recipe)
+        pre_delete.connect(forget_deleted_plan, sender=MealPlan)
+        for reference in (registry.tags, registry.ingredients):
+            for signal in (post_save, post_delete):
+                signal.connect(reference.bump, sender=reference.model,
+                               weak=False)
@@ -0,0 +1,58 @@
+import hashlib
+import re
+import unicodedata
+
+SIMHASH_BITS = 64
+SIMHASH_BANDS = 4
+SIMHASH_BAND_BITS = SIMHASH_BITS // SIMHASH_BANDS
+SHINGLE_SIZE = 3
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize_text(text):
+    """Текст без различий в регистре, пробелах и форме символов."""
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    return ' '.join(text.split())
+
+
+def text_hash(text):
+    """SHA-256 нормализованного текста для поиска точных копий."""
+    return hashlib.sha256(normalize_text(text).encode()).hexdigest()
+
+
+def to_signed(value):
+    """Беззнаковое 64-битное число в диапазоне BigIntegerField."""
+    if value >> (SIMHASH_BITS - 1):
+        return value - (1 << SIMHASH_BITS)
+    return value
+
+
+def to_unsigned(value):
+    return value & ((1 << SIMHASH_BITS) - 1)
+
+
+def simhash(text):
+    """SimHash по словесным шинглам: похожие тексты дают близкие хэши."""
+    words = WORD_RE.findall(normalize_text(text))
+    shingles = {' '.join(words[i:i + SHINGLE_SIZE])
+                for i in range(max(len(words) - SHINGLE_SIZE + 1, 1))}
+    weights = [0] * SIMHASH_BITS
+    for shingle in shingles:
+        value = int.from_bytes(
+            hashlib.blake2b(shingle.encode(), digest_size=8).digest(), 'big')
+        for bit in range(SIMHASH_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def simhash_bands(value):
+    """Части хэша: у хэшей на расстоянии меньше SIMHASH_BANDS
+    хотя бы одна часть обязательно совпадает."""
+    mask = (1 << SIMHASH_BAND_BITS) - 1
+    return [value >> (band * SIMHASH_BAND_BITS) & mask
+            for band in range(SIMHASH_BANDS)]
+
+
+def hamming_distance(first, second):
+    return bin(to_unsigned(first) ^ to_unsigned(second)).count('1')
@@ -0,0 +1,124 @@
+import os
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import Recipe
+
+PROGRESS_EVERY = 100000
+
+
+def iter_files(root, directory=''):
+    """Файлы дерева как (имя относительно MEDIA_ROOT, DirEntry).
+
+    Обход идёт через os.scandir со стеком каталогов, поэтому в памяти
+    одновременно держится только путь до текущего каталога.
+    """
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, current))
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                name = f'{current}/{entry.name}' if current else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(name)
+                elif entry.is_file(follow_symlinks=False):
+                    yield name, entry
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = "Delete or quarantine media files no recipe refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directory', default='recipes',
+                            help='Subdirectory of MEDIA_ROOT to scan')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only report orphaned files')
+        parser.add_argument('--quarantine',
+                            help='Move orphans to this directory '
+                                 'instead of deleting them')
+        parser.add_argument('--grace-period', type=int,
+                            default=settings.MEDIA_GC_GRACE_PERIOD,
+                            help='Skip files modified less than this '
+                                 'many seconds ago')
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Repeat the scan with this interval '
+                                 'instead of exiting')
+
+    def handle(self, *args, **options):
+        while True:
+            self.scan(options)
+            if options['watch'] is None:
+                return
+            time.sleep(options['watch'])
+
+    def scan(self, options):
+        root = Path(settings.MEDIA_ROOT)
+        quarantine = options['quarantine'] and Path(options['quarantine'])
+        if quarantine and quarantine.resolve().is_relative_to(
+                root.resolve() / options['directory']):
+            raise CommandError('Карантин не может лежать внутри '
+                               'сканируемого каталога')
+        cutoff = time.time() - options['grace_period']
+        storage = Recipe._meta.get_field('image').storage
+        started = time.perf_counter()
+        scanned = orphans = freed = 0
+
+        for batch in batches(iter_files(root, options['directory']),
+                             options['batch_size']):
+            entries = dict(batch)
+            # Без DISTINCT общее изображение тысяч рецептов пришло бы
+            # тысячами одинаковых строк.
+            referenced = set(Recipe.objects.filter(
+                image__in=entries).order_by().values_list(
+                'image', flat=True).distinct())
+            for name, entry in entries.items():
+                if name in referenced:
+                    continue
+                try:
+                    stat = entry.stat(follow_symlinks=False)
+                except FileNotFoundError:
+                    continue
+                if stat.st_mtime > cutoff:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(name)
+                elif not storage.delete_stale(
+                        name, cutoff, quarantine and quarantine / name):
+                    # Файл продлили после проверки ссылок.
+                    continue
+                orphans += 1
+                freed += stat.st_size
+            previous, scanned = scanned, scanned + len(entries)
+            if scanned // PROGRESS_EVERY > previous // PROGRESS_EVERY:
+                self.report(scanned, orphans, freed, started)
+
+        self.report(scanned, orphans, freed, started)
+        action = ('Найдено' if options['dry_run']
+                  else 'Перемещено в карантин' if quarantine else 'Удалено')
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {orphans}'))
+
+    def report(self, scanned, orphans, freed, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'Просмотрено {scanned} файлов за {elapsed:.1f} с '
+            f'({scanned / max(elapsed, 1e-9):.0f} файлов/с), '
+            f'без ссылок: {orphans} ({freed / 2 ** 20:.1f} МБ)')
@@ -2,6 +2,7 @@ import csv
 
 from django.conf import settings
 from django.core.management.base import BaseCommand
+from recipes import registry
 from recipes.models import Ingredient
 
 
@@ -21,6 +22,7 @@ class Command(BaseCommand):
 
             if ingredients_to_create:
                 Ingredient.objects.bulk_create(ingredients_to_create)
+                registry.ingredients.bump()
                 self.stdout.write(self.style.SUCCESS(
                     'Ингредиенты успешно загружены'))
             else:
@@ -0,0 +1,49 @@
+import csv
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import Ingredient, IngredientNutrition
+from recipes.nutrition import NUTRIENTS
+
+
+class Command(BaseCommand):
+    help = "Load ingredient nutrition facts from CSV and recompute recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', required=True,
+            help='CSV with name, measurement_unit, calories, proteins, '
+                 'fats, carbohydrates per 100 g and optional '
+                 'grams_per_unit')
+
+    def handle(self, *args, **options):
+        ingredients = {
+            (name, unit): pk for pk, name, unit in
+            Ingredient.objects.values_list('pk', 'name', 'measurement_unit')}
+        rows, unknown = {}, 0
+        try:
+            with open(options['path'], 'r', encoding='utf-8') as csv_file:
+                for row in csv.DictReader(csv_file):
+                    pk = ingredients.get(
+                        (row['name'], row['measurement_unit']))
+                    if pk is None:
+                        unknown += 1
+                        continue
+                    grams = row.get('grams_per_unit')
+                    rows[pk] = IngredientNutrition(
+                        ingredient_id=pk,
+                        grams_per_unit=float(grams) if grams else None,
+                        **{name: float(row[name]) for name in NUTRIENTS})
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать файл: {error}')
+        except (KeyError, ValueError) as error:
+            raise CommandError(f'Неверный формат файла: {error}')
+
+        with transaction.atomic():
+            IngredientNutrition.objects.filter(pk__in=rows).delete()
+            IngredientNutrition.objects.bulk_create(rows.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {len(rows)}, не найдено ингредиентов: {unknown}'))
+        call_command('recompute_nutrition', stdout=self.stdout)
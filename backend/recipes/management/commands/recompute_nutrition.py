@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.nutrition import BATCH_SIZE, numpy, recompute_nutrition
+
+
+class Command(BaseCommand):
+    help = "Recompute stored nutrition totals of all recipes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Recipes per batch')
+        parser.add_argument('--no-numpy', action='store_true',
+                            help='Compute in plain Python even if numpy '
+                                 'is installed')
+
+    def handle(self, *args, **options):
+        vectorized = not options['no_numpy'] and numpy is not None
+        started = time.perf_counter()
+        updated = recompute_nutrition(
+            batch_size=options['batch_size'], vectorized=vectorized)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated} за '
+            f'{time.perf_counter() - started:.1f} с '
+            f'({"numpy" if vectorized else "python"})'))
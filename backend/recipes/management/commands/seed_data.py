@@ -0,0 +1,233 @@
+import csv
+import io
+import random
+import time
+from bisect import bisect
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from recipes.fingerprints import (simhash, simhash_bands, text_hash,
+                                  to_signed)
+from recipes.models import (Favorites, Ingredient, Recipe, RecipeIngredient,
+                            ShoppingCart, Tag)
+from recipes.nutrition import NUTRIENTS, recompute_nutrition
+from users.models import Subscription, User
+
+USERS_PER_SCALE = 1000
+RECIPES_PER_SCALE = 5000
+FAVORITES_PER_USER = 20
+CART_PER_USER = 8
+SUBSCRIPTIONS_PER_USER = 10
+INGREDIENTS_PER_RECIPE = (3, 12)
+TAGS_PER_RECIPE = (1, 3)
+ZIPF_EXPONENT = 1.1
+SEED_PASSWORD = 'foodgram-seed'
+USER_FIELDS = ('id', 'email', 'username', 'first_name', 'last_name',
+               'password', 'is_superuser', 'is_staff', 'is_active',
+               'date_joined')
+RECIPE_FIELDS = ('id', 'author_id', 'name', 'image', 'text',
+                 'cooking_time', 'servings', 'pub_date', 'text_hash',
+                 'simhash',
+                 'simhash_0', 'simhash_1', 'simhash_2', 'simhash_3',
+                 *NUTRIENTS)
+
+
+class ZipfSampler:
+    """Выбор индекса из range(n) по степенному закону."""
+
+    def __init__(self, n, rng, exponent=ZIPF_EXPONENT):
+        self.rng = rng
+        self.cum_weights = list(accumulate(
+            1 / (rank + 1) ** exponent for rank in range(n)))
+
+    def __call__(self):
+        return bisect(self.cum_weights,
+                      self.rng.random() * self.cum_weights[-1])
+
+
+class RowStream(io.TextIOBase):
+    """Файлоподобный объект, отдающий строки CSV для COPY по мере чтения."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.buffer = ''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            chunk = list(islice(self.rows, 1000))
+            if not chunk:
+                break
+            output = io.StringIO()
+            csv.writer(output).writerows(chunk)
+            self.buffer += output.getvalue()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+class Command(BaseCommand):
+    help = "Generate a large deterministic synthetic dataset"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        scale = options['scale']
+
+        if not Tag.objects.exists():
+            call_command('load_tags', stdout=io.StringIO())
+        if not Ingredient.objects.exists():
+            call_command('load_ingredients', stdout=io.StringIO())
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True))
+
+        first_user = (User.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        first_recipe = (
+            Recipe.objects.aggregate(Max('id'))['id__max'] or 0) + 1
+        self.user_ids = range(first_user,
+                              first_user + USERS_PER_SCALE * scale)
+        self.recipe_ids = range(first_recipe,
+                                first_recipe + RECIPES_PER_SCALE * scale)
+        self.popular_users = ZipfSampler(len(self.user_ids), self.rng)
+        self.popular_recipes = ZipfSampler(len(self.recipe_ids), self.rng)
+
+        with transaction.atomic():
+            self.load(User, USER_FIELDS, self.users())
+            self.load(Recipe, RECIPE_FIELDS, self.recipes())
+            self.load(Recipe.tags.through, ('recipe_id', 'tag_id'),
+                      self.recipe_tags())
+            self.load(RecipeIngredient,
+                      ('recipe_id', 'ingredient_id', 'amount'),
+                      self.recipe_ingredients())
+            # КБЖУ считаются по уже загруженным ингредиентам.
+            recompute_nutrition(Recipe.objects.filter(
+                pk__gte=self.recipe_ids.start, pk__lt=self.recipe_ids.stop))
+            self.load(Subscription, ('user_id', 'author_id'),
+                      self.subscriptions())
+            self.load(Favorites, ('user_id', 'recipe_id'),
+                      self.user_lists(FAVORITES_PER_USER))
+            self.load(ShoppingCart, ('user_id', 'recipe_id'),
+                      self.user_lists(CART_PER_USER))
+            self.reset_sequences()
+        self.stdout.write(self.style.SUCCESS('Данные успешно созданы'))
+
+    def load(self, model, fields, rows):
+        started = time.perf_counter()
+        if connection.vendor == 'postgresql':
+            total = self.copy(model, fields, rows)
+        else:
+            total = self.bulk_create(model, fields, rows)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'{model._meta.db_table}: {total} строк за {elapsed:.1f} с '
+            f'({total / max(elapsed, 1e-9):.0f} строк/с)')
+
+    def bulk_create(self, model, fields, rows):
+        total = 0
+        while True:
+            batch = [model(**dict(zip(fields, row)))
+                     for row in islice(rows, self.batch_size)]
+            if not batch:
+                return total
+            model.objects.bulk_create(batch)
+            total += len(batch)
+
+    def copy(self, model, fields, rows):
+        counter = {'rows': 0}
+
+        def counted():
+            for row in rows:
+                counter['rows'] += 1
+                yield row
+
+        columns = ', '.join(
+            connection.ops.quote_name(model._meta.get_field(field).column)
+            for field in fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {connection.ops.quote_name(model._meta.db_table)} '
+                f'({columns}) FROM STDIN WITH (FORMAT csv)',
+                RowStream(counted()))
+        return counter['rows']
+
+    def reset_sequences(self):
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Recipe])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def users(self):
+        # Один хэш на всех: хэширование пароля для каждой строки
+        # заняло бы больше времени, чем вся остальная генерация.
+        password = make_password(SEED_PASSWORD)
+        now = timezone.now()
+        for user_id in self.user_ids:
+            yield (user_id, f'seed{user_id}@example.com', f'seed{user_id}',
+                   'Seed', f'User {user_id}', password,
+                   False, False, True, now)
+
+    def recipes(self):
+        now = timezone.now()
+        for recipe_id in self.recipe_ids:
+            text = f'Сгенерированное описание рецепта {recipe_id}.'
+            value = simhash(text)
+            yield (recipe_id, self.user_ids[self.popular_users()],
+                   f'Рецепт {recipe_id}', 'recipes/seed.png', text,
+                   self.rng.randint(5, 180), 1, now, text_hash(text),
+                   to_signed(value), *simhash_bands(value),
+                   *[0.0] * len(NUTRIENTS))
+
+    def recipe_tags(self):
+        for recipe_id in self.recipe_ids:
+            count = min(self.rng.randint(*TAGS_PER_RECIPE), len(self.tag_ids))
+            for tag_id in self.rng.sample(self.tag_ids, count):
+                yield recipe_id, tag_id
+
+    def recipe_ingredients(self):
+        for recipe_id in self.recipe_ids:
+            count = self.rng.randint(*INGREDIENTS_PER_RECIPE)
+            for ingredient_id in self.rng.sample(self.ingredient_ids, count):
+                yield recipe_id, ingredient_id, self.rng.randint(1, 1000)
+
+    def heavy_tailed_count(self, mean, population):
+        # Среднее распределения Парето с параметром 3 равно 1.5.
+        return min(int(mean * self.rng.paretovariate(3) / 1.5),
+                   population // 2)
+
+    def subscriptions(self):
+        for user_id in self.user_ids:
+            authors = set()
+            count = self.heavy_tailed_count(
+                SUBSCRIPTIONS_PER_USER, len(self.user_ids))
+            while len(authors) < count:
+                author_id = self.user_ids[self.popular_users()]
+                if author_id != user_id:
+                    authors.add(author_id)
+            for author_id in authors:
+                yield user_id, author_id
+
+    def user_lists(self, mean):
+        for user_id in self.user_ids:
+            recipes = set()
+            count = self.heavy_tailed_count(mean, len(self.recipe_ids))
+            while len(recipes) < count:
+                recipes.add(self.recipe_ids[self.popular_recipes()])
+            for recipe_id in recipes:
+                yield user_id, recipe_id
@@ -0,0 +1,76 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:01
+
+from django.db import migrations, models
+
+from recipes.fingerprints import (simhash, simhash_bands, text_hash,
+                                  to_signed)
+
+
+def fill_fingerprints(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    seen = set()
+    batch = []
+    for recipe in Recipe.objects.only('id', 'text').order_by('id').iterator():
+        value = simhash(recipe.text)
+        digest = text_hash(recipe.text)
+        # Уже существующие копии оставляем без хэша, чтобы не нарушить
+        # уникальность: новые копии всё равно будут отклонены.
+        recipe.text_hash = None if digest in seen else digest
+        seen.add(digest)
+        recipe.simhash = to_signed(value)
+        (recipe.simhash_0, recipe.simhash_1,
+         recipe.simhash_2, recipe.simhash_3) = simhash_bands(value)
+        batch.append(recipe)
+        if len(batch) >= 1000:
+            Recipe.objects.bulk_update(batch, FINGERPRINT_FIELDS)
+            batch = []
+    Recipe.objects.bulk_update(batch, FINGERPRINT_FIELDS)
+
+
+FINGERPRINT_FIELDS = ('text_hash', 'simhash', 'simhash_0', 'simhash_1',
+                      'simhash_2', 'simhash_3')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='tag',
+            options={'ordering': ['id'], 'verbose_name': 'Тег', 'verbose_name_plural': 'Теги'},
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='simhash',
+            field=models.BigIntegerField(editable=False, null=True, verbose_name='SimHash описания'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='simhash_0',
+            field=models.PositiveIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='simhash_1',
+            field=models.PositiveIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='simhash_2',
+            field=models.PositiveIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='simhash_3',
+            field=models.PositiveIntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='text_hash',
+            field=models.CharField(editable=False, max_length=64, null=True, unique=True, verbose_name='Хэш описания'),
+        ),
+        migrations.RunPython(fill_fingerprints, migrations.RunPython.noop),
+    ]
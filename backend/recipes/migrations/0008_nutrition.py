@@ -0,0 +1,50 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:42
+
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientNutrition',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='nutrition', serialize=False, to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('grams_per_unit', models.FloatField(blank=True, help_text='Можно не указывать для г, кг, мл, л, ложек и стакана.', null=True, validators=[django.core.validators.MinValueValidator(0)], verbose_name='Масса единицы измерения, г')),
+                ('calories', models.FloatField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Калорийность, ккал')),
+                ('proteins', models.FloatField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Белки, г')),
+                ('fats', models.FloatField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Жиры, г')),
+                ('carbohydrates', models.FloatField(validators=[django.core.validators.MinValueValidator(0)], verbose_name='Углеводы, г')),
+            ],
+            options={
+                'verbose_name': 'Пищевая ценность',
+                'verbose_name_plural': 'Пищевая ценность',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='calories',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Калорийность, ккал'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbohydrates',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Углеводы, г'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fats',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Жиры, г'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='proteins',
+            field=models.FloatField(db_index=True, default=0, editable=False, verbose_name='Белки, г'),
+        ),
+    ]
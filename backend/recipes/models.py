@@ -3,12 +3,18 @@ from django.core.validators import (MinValueValidator,
                                     RegexValidator,
                                     MaxValueValidator)
 from django.db import models
+from django.db.models import Q
+
+from .fingerprints import (SIMHASH_BANDS, hamming_distance, simhash,
+                           simhash_bands, text_hash, to_signed)
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
 LENGTH_OF_STR = 20
 MIN_VALUE = 1
 MAX_VALUE = 32767
+MAX_SERVINGS = 100
 
 
 class Tag(models.Model):
@@ -45,6 +51,25 @@ class Tag(models.Model):
         return super().clean()
 
 
+class ReferenceVersion(models.Model):
+    """Номер версии справочника, общий для всех процессов."""
+
+    name = models.CharField(
+        'Справочник',
+        max_length=50,
+        unique=True)
+    version = models.PositiveBigIntegerField(
+        'Версия',
+        default=0)
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
+
+
 class Ingredient(models.Model):
     """Модель ингредиентов для рецептов."""
 
@@ -73,6 +98,73 @@ class Ingredient(models.Model):
         super().clean()
 
 
+class IngredientNutrition(models.Model):
+    """Пищевая ценность 100 г ингредиента."""
+
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Ингредиент',
+        related_name='nutrition')
+    grams_per_unit = models.FloatField(
+        'Масса единицы измерения, г',
+        null=True,
+        blank=True,
+        validators=(MinValueValidator(0),),
+        help_text='Можно не указывать для г, кг, мл, л, ложек и стакана.')
+    calories = models.FloatField(
+        'Калорийность, ккал',
+        validators=(MinValueValidator(0),))
+    proteins = models.FloatField(
+        'Белки, г',
+        validators=(MinValueValidator(0),))
+    fats = models.FloatField(
+        'Жиры, г',
+        validators=(MinValueValidator(0),))
+    carbohydrates = models.FloatField(
+        'Углеводы, г',
+        validators=(MinValueValidator(0),))
+
+    class Meta:
+        verbose_name = 'Пищевая ценность'
+        verbose_name_plural = 'Пищевая ценность'
+
+    def __str__(self):
+        return str(self.ingredient)
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def visible(self):
+        """Рецепты без заблокированных авторов.
+
+        Автор блокируется до фонового удаления его данных, и его рецепты
+        не должны показываться, пока удаление не завершится.
+        """
+        return self.filter(author__is_active=True)
+
+    def same_text(self, text):
+        """Рецепты с тем же описанием с точностью до регистра и пробелов."""
+        return self.filter(text_hash=text_hash(text))
+
+    def similar_text(self, text, distance=SIMHASH_BANDS - 1):
+        """Рецепты с почти совпадающим описанием.
+
+        Кандидаты ищутся по индексам частей SimHash, поэтому расстояние
+        не может превышать SIMHASH_BANDS - 1.
+        """
+        value = simhash(text)
+        distance = min(distance, SIMHASH_BANDS - 1)
+        query = Q()
+        for band, band_value in enumerate(simhash_bands(value)):
+            query |= Q(**{f'simhash_{band}': band_value})
+        candidates = self.filter(query).values_list('pk', 'simhash')
+        return self.filter(pk__in=[
+            pk for pk, candidate in candidates
+            if hamming_distance(value, candidate) <= distance])
+
+
 class Recipe(models.Model):
     """Модель для рецептов."""
 
@@ -83,13 +175,15 @@ class Recipe(models.Model):
         related_name='recipes')
     name = models.CharField(
         'Название',
-        max_length=200)
+        max_length=200,
+        db_index=True)
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True)
     image = models.ImageField(
         'Изображение',
-        upload_to='recipes/')
+        upload_to='recipes/',
+        storage=ContentAddressedStorage())
     text = models.TextField(
         'Описание')
     tags = models.ManyToManyField(
@@ -109,11 +203,67 @@ class Recipe(models.Model):
             MaxValueValidator(
                 MAX_VALUE,
                 message='Очень долго ждать...')))
+    servings = models.PositiveSmallIntegerField(
+        'Количество порций',
+        default=1,
+        validators=(
+            MinValueValidator(MIN_VALUE),
+            MaxValueValidator(MAX_SERVINGS)))
+    # Пересчитываются при изменении ингредиентов, см. nutrition.py.
+    calories = models.FloatField(
+        'Калорийность, ккал',
+        default=0,
+        editable=False,
+        db_index=True)
+    proteins = models.FloatField(
+        'Белки, г',
+        default=0,
+        editable=False,
+        db_index=True)
+    fats = models.FloatField(
+        'Жиры, г',
+        default=0,
+        editable=False,
+        db_index=True)
+    carbohydrates = models.FloatField(
+        'Углеводы, г',
+        default=0,
+        editable=False,
+        db_index=True)
+
+    text_hash = models.CharField(
+        'Хэш описания',
+        max_length=64,
+        unique=True,
+        null=True,
+        editable=False)
+    simhash = models.BigIntegerField(
+        'SimHash описания',
+        null=True,
+        editable=False)
+    simhash_0 = models.PositiveIntegerField(null=True, editable=False,
+                                            db_index=True)
+    simhash_1 = models.PositiveIntegerField(null=True, editable=False,
+                                            db_index=True)
+    simhash_2 = models.PositiveIntegerField(null=True, editable=False,
+                                            db_index=True)
+    simhash_3 = models.PositiveIntegerField(null=True, editable=False,
+                                            db_index=True)
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            # Сборщик файлов ищет рецепты по имени изображения.
+            models.Index(fields=('image',), name='recipe_image_idx'),
+            # Лента рецептов и рецепты автора в порядке публикации.
+            models.Index(fields=('-pub_date',), name='recipe_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date'),
+                         name='recipe_author_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.name[:LENGTH_OF_STR]
@@ -122,6 +272,18 @@ class Recipe(models.Model):
         self.name = self.name.capitalize()
         return super().clean()
 
+    def save(self, *args, **kwargs):
+        self.update_fingerprints()
+        super().save(*args, **kwargs)
+
+    def update_fingerprints(self):
+        """Пересчитывает хэши описания; вызывается и перед bulk_create."""
+        value = simhash(self.text)
+        self.text_hash = text_hash(self.text)
+        self.simhash = to_signed(value)
+        (self.simhash_0, self.simhash_1,
+         self.simhash_2, self.simhash_3) = simhash_bands(value)
+
 
 class RecipeIngredient(models.Model):
     """Промежуточная модель для связей
@@ -199,6 +361,15 @@ class Favorites(UserList):
 class ShoppingCart(UserList):
     """Модель для рецептов в списке покупок пользователей"""
 
+    servings = models.PositiveSmallIntegerField(
+        'Количество порций',
+        null=True,
+        blank=True,
+        validators=(
+            MinValueValidator(MIN_VALUE),
+            MaxValueValidator(MAX_SERVINGS)),
+        help_text='Если не указано — как в рецепте.')
+
     class Meta:
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
@@ -206,3 +377,58 @@ class ShoppingCart(UserList):
             models.UniqueConstraint(
                 fields=['user', 'recipe'],
                 name='unique_shopping_cart')]
+
+
+class MealPlan(models.Model):
+    """Рецепт, запланированный пользователем на приём пищи."""
+
+    BREAKFAST = 'breakfast'
+    LUNCH = 'lunch'
+    DINNER = 'dinner'
+    SNACK = 'snack'
+    MEALS = (
+        (BREAKFAST, 'Завтрак'),
+        (LUNCH, 'Обед'),
+        (DINNER, 'Ужин'),
+        (SNACK, 'Перекус'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Пользователь',
+        related_name='meal_plans')
+    date = models.DateField('Дата')
+    meal = models.CharField(
+        'Приём пищи',
+        max_length=10,
+        choices=MEALS)
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        verbose_name='Рецепт',
+        related_name='meal_plans')
+    servings = models.PositiveSmallIntegerField(
+        'Количество порций',
+        null=True,
+        blank=True,
+        validators=(
+            MinValueValidator(MIN_VALUE),
+            MaxValueValidator(MAX_SERVINGS)),
+        help_text='Если не указано — как в рецепте.')
+
+    class Meta:
+        verbose_name = 'План питания'
+        verbose_name_plural = 'Планы питания'
+        ordering = ('date', 'id')
+        constraints = [
+            # Индекс ограничения начинается с (user, date) и служит
+            # выборкам плана за период.
+            models.UniqueConstraint(
+                fields=['user', 'date', 'meal', 'recipe'],
+                name='unique_meal_plan')]
+
+    def __str__(self):
+        return (f'{self.user.username}: {self.date} '
+                f'{self.get_meal_display()} -> '
+                f'{self.recipe.name[:LENGTH_OF_STR]}')
@@ -0,0 +1,92 @@
+"""Сводка ингредиентов плана питания и её кэш.
+
+Кэшируется только текущая неделя — её открывают чаще всего. Запись
+сбрасывается после коммита любого изменения плана пользователя, в том
+числе удаления рецепта из плана вместе с самим рецептом, и изменения
+ингредиентов или порций запланированного на неделю рецепта.
+Кэш должен быть общим для всех процессов, иначе сброс в одном
+процессе не увидят остальные; без MEAL_PLAN_CACHE_ALIAS сводка
+считается на каждый запрос.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from .models import MealPlan
+from .shopping import display_amount, plan_ingredients
+
+CACHE_PREFIX = 'meal-plan-week:'
+
+
+def get_cache():
+    alias = settings.MEAL_PLAN_CACHE_ALIAS
+    return caches[alias] if alias else None
+
+
+def current_week(today=None):
+    """Понедельник и воскресенье текущей недели."""
+    today = today or timezone.localdate()
+    start = today - datetime.timedelta(days=today.weekday())
+    return start, start + datetime.timedelta(days=6)
+
+
+def week_key(user_id, start):
+    return f'{CACHE_PREFIX}{user_id}:{start.isoformat()}'
+
+
+def summarize(user, start, end):
+    summary = []
+    for name, unit, total in plan_ingredients(user, start, end):
+        measurement_unit, amount = display_amount(unit, total)
+        summary.append({'name': name,
+                        'measurement_unit': measurement_unit,
+                        'amount': amount})
+    return summary
+
+
+def plan_summary(user, start, end):
+    """Сводка ингредиентов плана за период, для текущей недели — из кэша."""
+    cache = get_cache()
+    week = current_week()
+    if cache is None or (start, end) != week:
+        return summarize(user, start, end)
+    key = week_key(user.pk, week[0])
+    summary = cache.get(key)
+    if summary is None:
+        summary = summarize(user, start, end)
+        cache.set(key, summary, settings.MEAL_PLAN_CACHE_TTL)
+    return summary
+
+
+def forget_weeks(user_ids):
+    """Сбрасывает после коммита кэш текущей недели пользователей."""
+    cache = get_cache()
+    if cache is None:
+        return
+    start, _ = current_week()
+    keys = [week_key(user_id, start) for user_id in set(user_ids)]
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_deleted_plan(sender, instance, **kwargs):
+    """Удаление записи плана, в том числе каскадом вместе с рецептом
+    или пользователем, сбрасывает кэш её недели."""
+    start, end = current_week()
+    if start <= instance.date <= end:
+        forget_weeks([instance.user_id])
+
+
+def forget_recipes(recipes):
+    """Сбрасывает кэш тех, у кого рецепты запланированы на эту неделю.
+
+    recipes — выборка рецептов или список их первичных ключей.
+    """
+    if get_cache() is None:
+        return
+    forget_weeks(MealPlan.objects.filter(
+        recipe__in=recipes, date__range=current_week()).values_list(
+        'user_id', flat=True).distinct())
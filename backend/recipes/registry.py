@@ -0,0 +1,97 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import Signal
+
+from .models import Ingredient, ReferenceVersion, Tag
+
+reference_changed = Signal()
+
+
+def get_version(name):
+    return ReferenceVersion.objects.filter(name=name).values_list(
+        'version', flat=True).first() or 0
+
+
+def bump_version(name):
+    """Увеличивает номер версии name, общий для всех процессов."""
+    updated = ReferenceVersion.objects.filter(name=name).update(
+        version=F('version') + 1)
+    if not updated:
+        try:
+            with transaction.atomic():
+                ReferenceVersion.objects.create(name=name, version=1)
+        except IntegrityError:
+            ReferenceVersion.objects.filter(name=name).update(
+                version=F('version') + 1)
+
+
+class ModelRegistry:
+    """Копия небольшой справочной таблицы в памяти процесса.
+
+    Строки загружаются при первом обращении. Любое изменение таблицы
+    увеличивает номер версии в БД; процесс сверяет его не чаще раза
+    в REFERENCE_CACHE_CHECK_INTERVAL секунд и при расхождении
+    перечитывает таблицу.
+    """
+
+    def __init__(self, model, lookups=()):
+        self.model = model
+        self.name = model._meta.label_lower
+        self.lookups = lookups
+        self.lock = threading.Lock()
+        self.data = None
+        self.version = None
+        self.checked = 0
+
+    def __deepcopy__(self, memo):
+        # Реестр общий для процесса; DRF копирует аргументы полей.
+        return self
+
+    def load(self):
+        objects = list(self.model.objects.all())
+        data = {'pk': {obj.pk: obj for obj in objects}}
+        for field in self.lookups:
+            data[field] = {getattr(obj, field): obj for obj in objects}
+        return data
+
+    def current_version(self):
+        return get_version(self.name)
+
+    def get_data(self):
+        now = time.monotonic()
+        if (self.data is not None and now - self.checked
+                < settings.REFERENCE_CACHE_CHECK_INTERVAL):
+            return self.data
+        with self.lock:
+            if now - self.checked >= settings.REFERENCE_CACHE_CHECK_INTERVAL:
+                version = self.current_version()
+                if self.data is None or version != self.version:
+                    self.data, self.version = self.load(), version
+                self.checked = time.monotonic()
+            return self.data
+
+    def all(self):
+        return list(self.get_data()['pk'].values())
+
+    def get(self, pk):
+        return self.get_data()['pk'].get(pk)
+
+    def get_by(self, field, value):
+        return self.get_data()[field].get(value)
+
+    def invalidate(self):
+        self.checked = 0
+
+    def bump(self, *args, **kwargs):
+        """Сообщает всем процессам, что справочник изменился."""
+        bump_version(self.name)
+        transaction.on_commit(self.invalidate)
+        reference_changed.send(sender=self.model)
+
+
+tags = ModelRegistry(Tag, lookups=('slug',))
+ingredients = ModelRegistry(Ingredient)
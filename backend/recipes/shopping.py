@@ -0,0 +1,100 @@
+"""Сводный список покупок по ингредиентам рецептов.
+
+Количества одного ингредиента в разных единицах одной величины
+(г и кг, мл и л, чайные и столовые ложки) переводятся в общую
+единицу и складываются в том же SQL-запросе, что и группировка.
+"""
+from django.db.models import Case, CharField, F, FloatField, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+from .models import RecipeIngredient
+
+# Единица измерения: (единица, в которой суммируется, множитель).
+UNIT_CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'ч. л.': ('ч. л.', 1),
+    'ст. л.': ('ч. л.', 3),
+}
+# Итог в базовой единице показывается в крупной, если он не меньше её;
+# ложки — только если выходит целое число столовых ложек.
+DISPLAY_UNITS = {
+    'г': ('кг', 1000, False),
+    'мл': ('л', 1000, False),
+    'ч. л.': ('ст. л.', 3, True),
+}
+PRECISION = 2
+
+
+def base_unit():
+    return Case(
+        *(When(ingredient__measurement_unit=unit, then=Value(base))
+          for unit, (base, _) in UNIT_CONVERSIONS.items()),
+        default=F('ingredient__measurement_unit'),
+        output_field=CharField())
+
+
+def unit_factor():
+    return Case(
+        *(When(ingredient__measurement_unit=unit, then=Value(factor))
+          for unit, (_, factor) in UNIT_CONVERSIONS.items()
+          if factor != 1),
+        default=Value(1),
+        output_field=FloatField())
+
+
+def aggregate_ingredients(items, multiplier):
+    """Строки (название, единица, количество) одним GROUP BY.
+
+    items — выборка RecipeIngredient, multiplier — выражение, на
+    которое умножается количество каждой строки, например отношение
+    нужного числа порций к числу порций рецепта.
+    """
+    return (
+        items
+        .annotate(unit=base_unit())
+        .values('ingredient__name', 'unit')
+        .annotate(total=Sum(
+            Cast('amount', FloatField()) * multiplier * unit_factor(),
+            output_field=FloatField()))
+        .order_by('ingredient__name', 'unit')
+        .values_list('ingredient__name', 'unit', 'total'))
+
+
+def cart_ingredients(user):
+    """Ингредиенты списка покупок с учётом выбранного числа порций."""
+    items = RecipeIngredient.objects.filter(
+        recipe__shoppingcart_recipe__user=user)
+    servings = Coalesce(F('recipe__shoppingcart_recipe__servings'),
+                        F('recipe__servings'))
+    return aggregate_ingredients(
+        items, Cast(servings, FloatField()) / F('recipe__servings'))
+
+
+def plan_ingredients(user, start, end):
+    """Ингредиенты плана питания за период с start по end включительно.
+
+    Рецепт, запланированный несколько раз, учитывается столько же раз.
+    """
+    items = RecipeIngredient.objects.filter(
+        recipe__meal_plans__user=user,
+        recipe__meal_plans__date__range=(start, end))
+    servings = Coalesce(F('recipe__meal_plans__servings'),
+                        F('recipe__servings'))
+    return aggregate_ingredients(
+        items, Cast(servings, FloatField()) / F('recipe__servings'))
+
+
+def display_amount(unit, amount):
+    """Количество в более крупной единице, если оно в ней не меньше 1."""
+    larger, factor, whole = DISPLAY_UNITS.get(unit, (unit, 1, False))
+    converted = round(amount / factor, PRECISION)
+    if amount >= factor and (not whole or converted.is_integer()):
+        return larger, converted
+    return unit, round(amount, PRECISION)
+
+
+def format_amount(amount):
+    return f'{amount:.{PRECISION}f}'.rstrip('0').rstrip('.')
@@ -0,0 +1,148 @@
+import fcntl
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+HASH_PREFIX_LENGTH = 2
+# Лежит в корне хранилища, вне сканируемых сборщиком каталогов.
+LOCK_NAME = '.collect.lock'
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, называющее файлы по SHA-256 содержимого.
+
+    Одинаковые файлы хранятся один раз, а содержимое файла с данным
+    именем никогда не меняется, поэтому его можно кэшировать навсегда.
+    Сами файлы хранилище не удаляет: этим занимается collect_images.
+    Запись и продление файла идут под общей блокировкой, удаление
+    сборщиком — под исключительной, поэтому сборщик не удалит файл
+    между проверкой его наличия и обновлением отметки времени.
+    """
+
+    @contextmanager
+    def locked(self, shared=False):
+        os.makedirs(self.location, exist_ok=True)
+        with open(self.path(LOCK_NAME), 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            yield
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(posixpath.dirname(name),
+                              digest[:HASH_PREFIX_LENGTH],
+                              digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.hashed_name(name, content)
+        with self.locked(shared=True):
+            if self.exists(name):
+                # Свежая отметка времени защищает файл от сборщика,
+                # пока ссылающийся на него рецепт ещё не сохранён.
+                os.utime(self.path(name))
+                return name
+            return self._save(name, content)
+
+    def delete_stale(self, name, cutoff, target=None):
+        """Удаляет файл или переносит его в target, если он не изменялся
+        с момента cutoff; возвращает, удалён ли файл.
+
+        Время изменения перечитывается под блокировкой прямо перед
+        удалением: файл, продлённый загрузкой после проверки ссылок,
+        остаётся на месте.
+        """
+        path = self.path(name)
+        with self.locked():
+            try:
+                if os.stat(path).st_mtime > cutoff:
+                    return False
+                if target is None:
+                    os.unlink(path)
+                else:
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    shutil.move(path, target)
+            except FileNotFoundError:
+                return False
+        return True
+
+    def _save(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(
+            dir=directory, prefix='.', suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    file.write(chunk)
+            os.chmod(temporary, self.file_permissions_mode or 0o644)
+            # Одновременная запись того же содержимого безопасна:
+            # побеждает любая из одинаковых копий.
+            os.replace(temporary, full_path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
+        return name
+
+
+def collect_images(model, names):
+    """Удаляет файлы, на которые не ссылается ни один рецепт.
+
+    Недавно записанные файлы пропускаются: на них может ссылаться
+    ещё не зафиксированная транзакция. Повторно их здесь не проверяют,
+    их удаляет периодический clean_media.
+    """
+    storage = model._meta.get_field('image').storage
+    cutoff = time.time() - settings.MEDIA_GC_GRACE_PERIOD
+    for name in set(names):
+        # На одно изображение могут ссылаться тысячи рецептов,
+        # поэтому проверяется только наличие ссылки.
+        if not model.objects.filter(image=name).exists():
+            storage.delete_stale(name, cutoff)
+
+
+def stored_name(instance):
+    """Имя файла без обращения к дескриптору поля (и к отложенной загрузке)."""
+    value = instance.__dict__.get('image')
+    return getattr(value, 'name', value) or None
+
+
+def schedule_collection(model, name):
+    if name:
+        transaction.on_commit(partial(collect_images, model, [name]))
+
+
+def remember_image(sender, instance, **kwargs):
+    value = instance.__dict__.get('image')
+    # Строка приходит только из БД; у нового объекта здесь файл.
+    instance._saved_image = value if isinstance(value, str) else None
+
+
+def release_replaced_image(sender, instance, **kwargs):
+    name = stored_name(instance)
+    if instance._saved_image and instance._saved_image != name:
+        schedule_collection(sender, instance._saved_image)
+    instance._saved_image = name
+
+
+def release_deleted_image(sender, instance, **kwargs):
+    schedule_collection(sender, stored_name(instance))
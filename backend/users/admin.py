@@ -1,17 +1,87 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
 
-from .models import Subscription, User
+from foodgram.pagination import EstimatedCountPaginator
+from .deletion import schedule_user_deletion
+from .models import Subscription, User, UserDeletion
 
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
     list_display = ('pk', 'username', 'email', 'first_name', 'last_name')
-    list_filter = ('is_active', 'is_staff', 'username', 'email')
+    list_filter = ('is_active', 'is_staff')
     list_display_links = ('username',)
-    search_fields = ('username', 'email')
+    # Префиксный поиск с учётом регистра использует индексы
+    # уникальных полей.
+    search_fields = ('username__startswith', 'email__startswith')
+    actions = ('delete_in_background',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_actions(self, request):
+        # Стандартное действие удаляет каскадом в запросе.
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        # Связанные данные удалит фоновое задание, страница
+        # подтверждения не обходит их каскадом.
+        return ([str(obj) for obj in objs],
+                {User._meta.verbose_name_plural: len(objs)}, set(), [])
+
+    def delete_model(self, request, obj):
+        schedule_user_deletion(obj, requested_by=request.user)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for user in queryset:
+                schedule_user_deletion(user, requested_by=request.user)
+
+    @admin.action(description='Удалить в фоновом режиме',
+                  permissions=('delete',))
+    def delete_in_background(self, request, queryset):
+        self.delete_queryset(request, queryset)
+        self.message_user(
+            request,
+            f'Пользователи заблокированы и будут удалены в фоне: '
+            f'{len(queryset)}.',
+            messages.SUCCESS)
+
+
+@admin.register(UserDeletion)
+class UserDeletionAdmin(admin.ModelAdmin):
+    list_display = ('user_pk', 'username', 'status', 'progress',
+                    'deleted_rows', 'created', 'heartbeat', 'finished')
+    list_filter = ('status',)
+    search_fields = ('username',)
+    readonly_fields = ('user_pk', 'username', 'requested_by', 'status',
+                       'progress', 'deleted_rows', 'error', 'created',
+                       'heartbeat', 'finished')
+    fields = readonly_fields
+    actions = ('retry',)
+
+    @admin.display(description='Ход выполнения')
+    def progress(self, obj):
+        if not obj.steps_total:
+            return '—'
+        return f'{obj.step}/{obj.steps_total}: {obj.step_name}'
+
+    @admin.action(description='Повторить')
+    def retry(self, request, queryset):
+        queryset.filter(status=UserDeletion.FAILED).update(
+            status=UserDeletion.PENDING, error='')
+
+    def has_add_permission(self, request):
+        return False
 
 
 @admin.register(Subscription)
 class SubscriptionAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
-    search_fields = ('user__username', 'author__username')
+    list_select_related = ('user', 'author')
+    search_fields = ('user__username__startswith',
+                     'author__username__startswith')
+    autocomplete_fields = ('user', 'author')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -0,0 +1,155 @@
+from dataclasses import dataclass, field
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.db.models import F, Q
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
+
+from .models import User, UserDeletion
+
+# Задание, от которого так долго нет вестей, считается брошенным
+# упавшим процессом и подбирается заново.
+LEASE = timedelta(minutes=5)
+
+
+def quote(name):
+    return connection.ops.quote_name(name)
+
+
+@dataclass
+class Step:
+    """Пакетное удаление (или обнуление ссылки) строк одной таблицы."""
+
+    model: type
+    condition: str
+    params: list = field(default_factory=list)
+    set_null: models.Field = None
+
+    @property
+    def label(self):
+        name = self.model._meta.verbose_name_plural
+        if self.set_null is not None:
+            return f'{name}: очистка поля «{self.set_null.verbose_name}»'
+        return str(name)
+
+    @property
+    def has_listeners(self):
+        return (pre_delete.has_listeners(self.model)
+                or post_delete.has_listeners(self.model))
+
+    def run(self, batch_size):
+        """Обрабатывает не больше batch_size строк; возвращает их число."""
+        opts = self.model._meta
+        table, pk = quote(opts.db_table), quote(opts.pk.column)
+        batch = (f'SELECT {pk} FROM {table} '
+                 f'WHERE {self.condition} LIMIT %s')
+        params = [*self.params, batch_size]
+        with connection.cursor() as cursor:
+            if self.set_null is not None:
+                cursor.execute(
+                    f'UPDATE {table} SET {quote(self.set_null.column)} = NULL '
+                    f'WHERE {pk} IN ({batch})', params)
+                return cursor.rowcount
+            if not self.has_listeners:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE {pk} IN ({batch})', params)
+                return cursor.rowcount
+            # Обработчики сигналов (кэши, файлы) должны отработать,
+            # поэтому такие строки удаляются через ORM той же пачкой.
+            cursor.execute(batch, params)
+            pks = [row[0] for row in cursor.fetchall()]
+        self.model._base_manager.filter(pk__in=pks).delete()
+        return len(pks)
+
+
+def deletion_plan(model, condition, params):
+    """Шаги удаления строк model вместе со всем, что на них ссылается.
+
+    Порядок повторяет каскад Django: сначала зависимые строки, потом
+    сами строки. Каждый шаг можно безопасно повторить.
+    """
+    opts = model._meta
+    rows = (f'SELECT {quote(opts.pk.column)} FROM {quote(opts.db_table)} '
+            f'WHERE {condition}')
+    steps = []
+    for relation in get_candidate_relations_to_delete(opts):
+        related_field = relation.field
+        on_delete = related_field.remote_field.on_delete
+        related_condition = f'{quote(related_field.column)} IN ({rows})'
+        if on_delete is models.CASCADE:
+            steps += deletion_plan(
+                relation.related_model, related_condition, params)
+        elif on_delete is models.SET_NULL:
+            steps.append(Step(relation.related_model, related_condition,
+                              params, set_null=related_field))
+        elif on_delete is not models.DO_NOTHING:
+            raise ValueError(
+                f'{related_field} ({on_delete.__name__}) не поддерживается '
+                f'при фоновом удалении')
+    steps.append(Step(model, condition, params))
+    return steps
+
+
+def user_deletion_plan(user_pk):
+    return deletion_plan(
+        User, f'{quote(User._meta.pk.column)} = %s', [user_pk])
+
+
+def schedule_user_deletion(user, requested_by=None):
+    """Блокирует пользователя сразу, а данные удаляет в фоне."""
+    with transaction.atomic():
+        user.is_active = False
+        user.save(update_fields=('is_active',))
+        deletion, _ = UserDeletion.objects.get_or_create(
+            user_pk=user.pk,
+            defaults={'username': user.username,
+                      'requested_by': requested_by})
+    return deletion
+
+
+def claim_deletion():
+    """Берёт в работу ожидающее или брошенное задание."""
+    now = timezone.now()
+    candidates = UserDeletion.objects.filter(
+        Q(status=UserDeletion.PENDING)
+        | Q(status=UserDeletion.RUNNING, heartbeat__lt=now - LEASE)
+    ).order_by('created')
+    for deletion in candidates[:10]:
+        claimed = UserDeletion.objects.filter(
+            pk=deletion.pk, status=deletion.status,
+            heartbeat=deletion.heartbeat,
+        ).update(status=UserDeletion.RUNNING, heartbeat=now)
+        if claimed:
+            deletion.refresh_from_db()
+            return deletion
+    return None
+
+
+def process_deletion(deletion, batch_size, progress=None):
+    """Выполняет задание пакетами, каждый в своей транзакции.
+
+    После падения задание начинается с первого шага: уже выполненные
+    шаги ничего не находят и проходят одним пустым запросом.
+    """
+    steps = user_deletion_plan(deletion.user_pk)
+    jobs = UserDeletion.objects.filter(pk=deletion.pk)
+    jobs.update(steps_total=len(steps))
+    try:
+        for index, step in enumerate(steps, start=1):
+            jobs.update(step=index, step_name=step.label,
+                        heartbeat=timezone.now())
+            while True:
+                with transaction.atomic():
+                    processed = step.run(batch_size)
+                    jobs.update(deleted_rows=F('deleted_rows') + processed,
+                                heartbeat=timezone.now())
+                if progress is not None and processed:
+                    progress(step, processed)
+                if processed < batch_size:
+                    break
+    except Exception as error:
+        jobs.update(status=UserDeletion.FAILED, error=repr(error))
+        raise
+    jobs.update(status=UserDeletion.DONE, finished=timezone.now(), error='')
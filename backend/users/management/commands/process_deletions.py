@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users.deletion import claim_deletion, process_deletion
+
+
+class Command(BaseCommand):
+    help = "Delete users scheduled for background deletion in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--watch', type=float, metavar='SECONDS',
+                            help='Keep polling for new jobs with this '
+                                 'interval instead of exiting')
+
+    def handle(self, *args, **options):
+        while True:
+            deletion = claim_deletion()
+            if deletion is None:
+                if options['watch'] is None:
+                    return
+                time.sleep(options['watch'])
+                continue
+            self.run(deletion, options['batch_size'])
+
+    def run(self, deletion, batch_size):
+        self.stdout.write(f'Удаление пользователя {deletion.username} '
+                          f'(id={deletion.user_pk})')
+        started = time.perf_counter()
+
+        def progress(step, processed):
+            self.stdout.write(f'  {step.label}: {processed}')
+
+        try:
+            process_deletion(deletion, batch_size, progress)
+        except Exception as error:
+            self.stderr.write(f'Ошибка: {error!r}')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователь {deletion.username} удалён за '
+            f'{time.perf_counter() - started:.1f} с'))
@@ -0,0 +1,38 @@
+# Generated by Django 3.2.3 on 2026-10-19 10:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDeletion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('user_pk', models.PositiveBigIntegerField(unique=True, verbose_name='ID пользователя')),
+                ('username', models.CharField(max_length=150, verbose_name='Имя пользователя')),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Завершено'), ('failed', 'Ошибка')], db_index=True, default='pending', max_length=10, verbose_name='Статус')),
+                ('step', models.PositiveSmallIntegerField(default=0, verbose_name='Текущий шаг')),
+                ('steps_total', models.PositiveSmallIntegerField(default=0, verbose_name='Всего шагов')),
+                ('step_name', models.CharField(blank=True, max_length=255, verbose_name='Что удаляется')),
+                ('deleted_rows', models.PositiveBigIntegerField(default=0, verbose_name='Обработано строк')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('heartbeat', models.DateTimeField(blank=True, null=True, verbose_name='Последняя активность')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Дата завершения')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Инициатор')),
+            ],
+            options={
+                'verbose_name': 'Удаление пользователя',
+                'verbose_name_plural': 'Удаления пользователей',
+                'ordering': ('-created',),
+            },
+        ),
+    ]
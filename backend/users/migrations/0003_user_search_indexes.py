@@ -0,0 +1,38 @@
+from django.db import migrations
+
+# Поиск ?search= в /api/users/ сравнивает UPPER(поле) LIKE 'СЛОВО%':
+# такие условия обслуживает индекс по тому же выражению с
+# text_pattern_ops. Выражения и классы операторов — синтаксис
+# PostgreSQL, на других СУБД индексы не создаются.
+SEARCH_FIELDS = ('username', 'first_name', 'last_name')
+
+
+def index_name(field):
+    return f'user_{field}_prefix_idx'
+
+
+def create_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name(field)} '
+            f'ON users_user ((UPPER({field}::text)) text_pattern_ops)')
+
+
+def drop_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in SEARCH_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name(field)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_userdeletion'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_indexes, drop_indexes),
+    ]
@@ -80,3 +80,77 @@ class Subscription(models.Model):
         if self.user == self.author:
             raise ValidationError(
                 'Пользователь не может подписаться на самого себя.')
+
+
+class UserDeletion(models.Model):
+    """Фоновое удаление пользователя вместе с его данными.
+
+    Хранит только идентификатор пользователя, а не ссылку на него:
+    запись переживает удаление пользователя и остаётся в истории.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    user_pk = models.PositiveBigIntegerField(
+        'ID пользователя',
+        unique=True)
+    username = models.CharField(
+        'Имя пользователя',
+        max_length=150)
+    requested_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        verbose_name='Инициатор',
+        related_name='+')
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True)
+    step = models.PositiveSmallIntegerField(
+        'Текущий шаг',
+        default=0)
+    steps_total = models.PositiveSmallIntegerField(
+        'Всего шагов',
+        default=0)
+    step_name = models.CharField(
+        'Что удаляется',
+        max_length=255,
+        blank=True)
+    deleted_rows = models.PositiveBigIntegerField(
+        'Обработано строк',
+        default=0)
+    error = models.TextField(
+        'Ошибка',
+        blank=True)
+    created = models.DateTimeField(
+        'Дата создания',
+        auto_now_add=True)
+    heartbeat = models.DateTimeField(
+        'Последняя активность',
+        null=True,
+        blank=True)
+    finished = models.DateTimeField(
+        'Дата завершения',
+        null=True,
+        blank=True)
+
+    class Meta:
+        verbose_name = 'Удаление пользователя'
+        verbose_name_plural = 'Удаления пользователей'
+        ordering = ('-created',)
+
+    def __str__(self):
+        return f'{self.username} ({self.get_status_display()})'